@@ -1,4 +1,5 @@
 import os
+import argparse
 import csv
 import io
 import json
@@ -13,10 +14,22 @@ import pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
 
 from src.gpt import process_text, CHAT_SETTINGS
+from src.endpoints import (
+    get_user_accounts,
+    get_user_categories,
+    get_user_labels,
+)
+from src.prompt_registry import (
+    PINNED_VERSIONS,
+    PROMPT_REGISTRY,
+    choose_versions,
+    render_prompt,
+)
 from src.main import (
     get_main_json_data,
     get_business_json_data,
     get_datetime_json_data,
+    get_user_json_data,
 )
 
 from logging_config import logging
@@ -25,6 +38,16 @@ CURRENT_TIME_ISO = "2025-10-01T14:32:10Z"
 CURRENT_TIME_DT = datetime.fromisoformat(
     CURRENT_TIME_ISO.replace("Z", "+00:00")
 )
+# User whose categories, labels and accounts the prompts are built from
+DEMO_USER_ID = 19
+
+# Optional ground truth columns of the user data extractors; without them
+# the obtained ids are stored but not scored
+USER_DATA_COLUMNS = {
+    "categories": ("Category", "categoryId"),
+    "labels": ("Labels", "labelsId"),
+    "accounts": ("Account", "accountId"),
+}
 
 
 def _read_csv_text(csv_path: Path) -> Tuple[List[str], List[List[str]]]:
@@ -53,10 +76,13 @@ def _idx(header: List[str], name: str) -> int:
     return lowered.index(name.strip().lower())
 
 
-def _safe_json_extract_description(text_response: str) -> str:
+def _safe_json_extract_description(text_response: Union[str, dict]) -> str:
     """Safely extract description field from JSON response."""
     try:
-        obj = json.loads(text_response)
+        if isinstance(text_response, dict):
+            obj = text_response
+        else:
+            obj = json.loads(text_response)
         value = obj.get("description", "")
         return value if isinstance(value, str) else ""
     except Exception:
@@ -151,6 +177,52 @@ def _business_metrics(
     )
 
 
+def _ids_match(gt_ids: str, obtained: Any) -> Optional[bool]:
+    """Compare ground truth ids ("3" or "3;7") with obtained ids.
+
+    Returns None when there is no ground truth column for the row.
+    """
+    if gt_ids is None:
+        return None
+    expected = {part.strip() for part in gt_ids.split(";") if part.strip()}
+    if isinstance(obtained, list):
+        found = {str(item) for item in obtained}
+    else:
+        found = {str(obtained)} if obtained is not None else set()
+    return expected == found
+
+
+def _row_versions(row_number: int, alternate: bool) -> Dict[str, str]:
+    """Pick the prompt versions of an eval row.
+
+    By default versions follow the traffic split or PROMPT_VERSIONS. With
+    alternate, every extractor cycles through its versions row by row, so
+    one run scores every variant on comparable rows.
+    """
+    if not alternate:
+        return choose_versions()
+    return {
+        extractor: PINNED_VERSIONS.get(
+            extractor, list(versions)[row_number % len(versions)]
+        )
+        for extractor, versions in PROMPT_REGISTRY.items()
+    }
+
+
+async def _load_user_data() -> Dict[str, Any]:
+    """Fetch the demo user data the user data prompts are built from."""
+    (modified_categories, _), labels, accounts = await asyncio.gather(
+        get_user_categories(DEMO_USER_ID),
+        get_user_labels(id=DEMO_USER_ID),
+        get_user_accounts(id=DEMO_USER_ID),
+    )
+    return {
+        "categories": modified_categories,
+        "labels": labels,
+        "accounts": accounts,
+    }
+
+
 def _datetimes_equal(a: Optional[str], b: Optional[str]) -> bool:
     """Check if two datetime strings are equal."""
     if not a or not b:
@@ -209,64 +281,6 @@ async def _judge_description(
         return False
 
 
-async def _get_best_business_match(
-    api_key: str, input_text: str, business_list: List[Dict[str, Any]]
-) -> str:
-    """Get the best business match from a list using LLM."""
-    if not business_list:
-        return ""
-
-    system_prompt = (
-        """
-###Ти експерт з визначення найкращого збігу назв бізнесів.
-# Твоя роль - точно ідентифікувати найбільш відповідну назву бізнесу з наданого
-# списку для вхідного тексту.###
-
-###Користувач надасть тобі вхідний текст та список бізнесів.
-Твоє завдання - визначити найкращий збіг бізнесу (часто вказується як "у" чи
-"в" назва бізнесу) зі списку business_list для input_text.###
-
-###Важливо:###
-- Це вже відфільтрований список бізнесів - тут список найімовірніших збігів
-- Аналізуй і звучання назв бізнесів теж
-- Вхідний текст - жива мова, назва бізнесу може виглядати по-різному
-- Порівнюй за змістом, звучанням та контекстом
-
-###Формат відповіді:###
-Поверни ВИКЛЮЧНО JSON:
-{"best_match": "назва бізнесу"|""}
-
-###Правила:###
-- Якщо є найкращий збіг серед наданих варіантів - поверни його назву
-- Якщо немає підходящого збігу - поверни порожній рядок ""
-
-###Повертай ВИКЛЮЧНО json файл у визначеному форматі і нічого більше (це важливо)!###
-"""
-    ).strip()
-
-    business_names = [str(m.get("name", "")).strip() for m in business_list]
-    user_prompt = json.dumps(
-        {
-            "input_text": input_text,
-            "business_list": business_names,
-        },
-        ensure_ascii=False,
-    )
-
-    try:
-        response = await process_text(
-            api_key,
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            model=CHAT_SETTINGS["judge_model"],
-        )
-        data = json.loads(response)
-        best_match = data.get("best_match", "")
-        return best_match if isinstance(best_match, str) else ""
-    except Exception:
-        return ""
-
-
 async def _eval_one_row(
     api_key: str,
     input_text: str,
@@ -275,27 +289,65 @@ async def _eval_one_row(
     gt_description: str,
     gt_amount: str,
     gt_currency: str,
+    gt_user_data: Dict[str, Optional[str]],
+    user_data: Dict[str, Any],
+    versions: Dict[str, str],
 ) -> Dict[str, Any]:
     """Evaluate a single row of test data against the model."""
+    user_data_tasks = {
+        name: asyncio.create_task(
+            get_user_json_data(
+                api_key,
+                input_text,
+                render_prompt(name, versions[name], user_data[name]),
+                name,
+                version=versions[name],
+            )
+        )
+        for name in USER_DATA_COLUMNS
+    }
+
     # Run primary model calls concurrently
-    main_task = asyncio.create_task(get_main_json_data(api_key, input_text))
+    main_task = asyncio.create_task(
+        get_main_json_data(api_key, input_text, version=versions["main"])
+    )
     dt_task = asyncio.create_task(
         get_datetime_json_data(
-            api_key, input_text, current_time=CURRENT_TIME_DT
+            api_key,
+            input_text,
+            current_time=CURRENT_TIME_DT,
+            version=versions["datetime"],
+        )
+    )
+    biz_task = asyncio.create_task(
+        get_business_json_data(
+            api_key, input_text, version=versions["business"]
         )
     )
-    biz_task = asyncio.create_task(get_business_json_data(api_key, input_text))
 
     main_resp, dt_resp, biz_resp = await asyncio.gather(
         main_task, dt_task, biz_task, return_exceptions=True
     )
 
+    # Category, labels and account ids
+    user_data_results = {}
+    for name, (_, field) in USER_DATA_COLUMNS.items():
+        try:
+            obtained = (await user_data_tasks[name]).get(field)
+        except Exception:
+            obtained = None
+        user_data_results[f"e_{field}"] = json.dumps(obtained)
+        user_data_results[f"o_{field}"] = gt_user_data[name]
+        user_data_results[f"e_{field}_is_matched"] = _ids_match(
+            gt_user_data[name], obtained
+        )
+
     # Description extraction
     e_description = ""
     if isinstance(main_resp, Exception):
         e_description = ""
     else:
-        e_description = _safe_json_extract_description(str(main_resp))
+        e_description = _safe_json_extract_description(main_resp)
 
     # Amount extraction
     e_amount = ""
@@ -337,11 +389,17 @@ async def _eval_one_row(
         _business_metrics(gt_business, matches_list)
     )
 
-    # Best business match
+    # Best business match picked by the local reranker
     e_best_b_match = ""
-    if matches_list:
-        e_best_b_match = await _get_best_business_match(
-            api_key, input_text, matches_list
+    if matches_list and isinstance(biz_resp, dict):
+        best_id = biz_resp.get("businessId")
+        e_best_b_match = next(
+            (
+                str(m.get("name", ""))
+                for m in matches_list
+                if m["id"] == best_id
+            ),
+            "",
         )
     e_is_b_best_match = (gt_business or "").strip().lower() == (
         e_best_b_match or ""
@@ -386,17 +444,28 @@ async def _eval_one_row(
         "o_currency": gt_currency,
         "e_currency": e_currency,
         "e_c_is_matched": e_c_is_matched,
+        **user_data_results,
+        "prompt_versions": json.dumps(versions, sort_keys=True),
     }
 
 
 async def _run_eval(
-    rows: List[List[str]], header: List[str]
+    rows: List[List[str]], header: List[str], alternate_versions: bool
 ) -> List[Dict[str, Any]]:
     """Run evaluation on all rows with concurrency control."""
     api_key = os.getenv("OPENAI_API_KEY", "")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not set")
 
+    user_data = await _load_user_data()
+    lowered_header = [h.strip().lower() for h in header]
+    i_user_data = {
+        name: (
+            _idx(header, column) if column.lower() in lowered_header else None
+        )
+        for name, (column, _) in USER_DATA_COLUMNS.items()
+    }
+
     i_input = _idx(header, "Input text")
     i_business = _idx(header, "Business")
     i_datetime = _idx(header, "Datetime")
@@ -406,7 +475,7 @@ async def _run_eval(
 
     semaphore = asyncio.Semaphore(5)
 
-    async def guard_call(row: List[str]) -> Dict[str, Any]:
+    async def guard_call(row_number: int, row: List[str]) -> Dict[str, Any]:
         """Guard concurrent calls with semaphore."""
         async with semaphore:
             input_text = row[i_input] if i_input < len(row) else ""
@@ -417,6 +486,14 @@ async def _run_eval(
             )
             gt_amount = row[i_amount] if i_amount < len(row) else ""
             gt_currency = row[i_currency] if i_currency < len(row) else ""
+            gt_user_data = {
+                name: (
+                    (row[index] if index < len(row) else "")
+                    if index is not None
+                    else None
+                )
+                for name, index in i_user_data.items()
+            }
             return await _eval_one_row(
                 api_key,
                 input_text,
@@ -425,9 +502,15 @@ async def _run_eval(
                 gt_description,
                 gt_amount,
                 gt_currency,
+                gt_user_data,
+                user_data,
+                _row_versions(row_number, alternate_versions),
             )
 
-    tasks = [asyncio.create_task(guard_call(r)) for r in rows]
+    tasks = [
+        asyncio.create_task(guard_call(row_number, r))
+        for row_number, r in enumerate(rows)
+    ]
     return await asyncio.gather(*tasks)
 
 
@@ -455,6 +538,16 @@ def _write_eval_csv(out_path: Path, data: List[Dict[str, Any]]) -> None:
         "o_currency",
         "e_currency",
         "e_c_is_matched",
+        *(
+            column
+            for _, field in USER_DATA_COLUMNS.values()
+            for column in (
+                f"o_{field}",
+                f"e_{field}",
+                f"e_{field}_is_matched",
+            )
+        ),
+        "prompt_versions",
     ]
     with out_path.open("w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=cols)
@@ -465,6 +558,14 @@ def _write_eval_csv(out_path: Path, data: List[Dict[str, Any]]) -> None:
 
 def main() -> None:
     """Main function to run evaluation and save results."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--alternate-versions",
+        action="store_true",
+        help="cycle every extractor through its prompt versions per row",
+    )
+    args = parser.parse_args()
+
     data_path = Path(__file__).with_name("eval_data.csv")
     out_path = Path(__file__).with_name("eval.csv")
 
@@ -473,7 +574,7 @@ def main() -> None:
         logging.error("No data found in eval/data.csv")
         return
 
-    results = asyncio.run(_run_eval(rows, header))
+    results = asyncio.run(_run_eval(rows, header, args.alternate_versions))
     _write_eval_csv(out_path, results)
     logging.info(f"Saved {len(results)} rows to {out_path}")
 
@@ -0,0 +1,190 @@
+import math
+import pathlib
+import random
+import sys
+from typing import Dict, List, Tuple
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from _eval.search_benchmark import _load_businesses, _load_queries
+from elastic.business_rerank import (
+    RERANK_WEIGHTS,
+    _latin_forms,
+    _query_signature,
+    candidate_features,
+    jaro_winkler,
+)
+from elastic.business_search import SEARCH_SETTINGS
+from logging_config import logger
+
+# Weights fitted on the eval businesses. user_prior is always 0 there, so
+# its weight keeps its value from RERANK_WEIGHTS
+FITTED_FEATURES = (
+    "jaro_winkler",
+    "token_set_ratio",
+    "phonetic",
+    "search_confidence",
+)
+FIT_SETTINGS = {
+    "candidates": SEARCH_SETTINGS["size"],  # candidates per query, as ES
+    "learning_rate": 0.5,
+    "epochs": 5000,
+    "l2": 0.001,  # keeps weights finite on separable features
+    "holdout": 0.3,  # share of businesses kept out of the fit
+    "seed": 13,
+}
+CALIBRATION_BINS = 5
+
+
+def _candidates(query: str, records: list, size: int) -> List[dict]:
+    """Stand in for the search: the nearest names by Jaro-Winkler.
+
+    Candidates get the confidence search_businesses gives a single value
+    ranked at their position, so hard negatives look like real results.
+    """
+    query_forms = _latin_forms(query)
+    scored = []
+    for record in records:
+        name_forms = _latin_forms(str(record.get("name", "")))
+        similarity = max(
+            (jaro_winkler(q, n) for q in query_forms for n in name_forms),
+            default=0.0,
+        )
+        scored.append((similarity, record))
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+
+    rrf_k = SEARCH_SETTINGS["rrf_k"]
+    return [
+        {**record, "confidence": (rrf_k + 1) / (rrf_k + rank)}
+        for rank, (_, record) in enumerate(scored[:size], 1)
+    ]
+
+
+def build_samples(
+    queries: List[Tuple[str, str]], records: list, size: int
+) -> List[Tuple[str, List[float], int]]:
+    """Return (expected name, features, label) for every candidate."""
+    samples = []
+    for query, expected in sorted(set(queries)):
+        query_forms, query_keys = _query_signature([query])
+        for candidate in _candidates(query, records, size):
+            features = candidate_features(query_forms, query_keys, candidate)
+            label = (
+                str(candidate.get("name", "")).strip().lower()
+                == expected.lower()
+            )
+            samples.append(
+                (
+                    expected,
+                    [features[name] for name in FITTED_FEATURES],
+                    int(label),
+                )
+            )
+    return samples
+
+
+def _predict(weights: List[float], features: List[float]) -> float:
+    """Return the logistic probability; weights[0] is the bias."""
+    logit = weights[0] + sum(w * x for w, x in zip(weights[1:], features))
+    return 1 / (1 + math.exp(-logit))
+
+
+def fit_logistic(
+    samples: List[Tuple[str, List[float], int]], settings: dict
+) -> List[float]:
+    """Fit bias and weights by gradient descent on the log loss.
+
+    Feature weights are kept non-negative: more similarity never lowers
+    the probability, even where the stand-in search confounds features.
+    """
+    weights = [0.0] * (len(FITTED_FEATURES) + 1)
+    for _ in range(settings["epochs"]):
+        gradient = [0.0] * len(weights)
+        for _, features, label in samples:
+            error = _predict(weights, features) - label
+            gradient[0] += error
+            for i, value in enumerate(features, 1):
+                gradient[i] += error * value
+        for i in range(len(weights)):
+            penalty = settings["l2"] * weights[i] if i else 0.0
+            weights[i] -= settings["learning_rate"] * (
+                gradient[i] / len(samples) + penalty
+            )
+            if i:
+                weights[i] = max(weights[i], 0.0)
+    return weights
+
+
+def report(
+    name: str, weights: List[float], samples: List[Tuple[str, list, int]]
+) -> Dict[str, float]:
+    """Print log loss, Brier score and a reliability table."""
+    eps = 1e-9
+    predictions = [(_predict(weights, f), label) for _, f, label in samples]
+    log_loss = -sum(
+        label * math.log(p + eps) + (1 - label) * math.log(1 - p + eps)
+        for p, label in predictions
+    ) / len(predictions)
+    brier = sum((p - label) ** 2 for p, label in predictions) / len(
+        predictions
+    )
+    print(f"{name}: log loss {log_loss:.4f}, Brier {brier:.4f}")
+    print(f"  {'predicted':<12} {'samples':>8} {'mean':>8} {'observed':>9}")
+    for b in range(CALIBRATION_BINS):
+        low, high = b / CALIBRATION_BINS, (b + 1) / CALIBRATION_BINS
+        in_bin = [
+            (p, label)
+            for p, label in predictions
+            if low <= p < high or (high == 1 and p == 1)
+        ]
+        if not in_bin:
+            continue
+        mean = sum(p for p, _ in in_bin) / len(in_bin)
+        observed = sum(label for _, label in in_bin) / len(in_bin)
+        print(
+            f"  {f'{low:.1f}-{high:.1f}':<12} {len(in_bin):>8} "
+            f"{mean:>8.3f} {observed:>9.3f}"
+        )
+    return {"log_loss": log_loss, "brier": brier}
+
+
+def main() -> None:
+    """Fit RERANK_WEIGHTS on the eval businesses and print them."""
+    records = _load_businesses()
+    queries = _load_queries()
+    samples = build_samples(queries, records, FIT_SETTINGS["candidates"])
+    logger.info(
+        f"Fitting on {len(samples)} candidates of {len(set(queries))} "
+        f"queries, {sum(label for *_, label in samples)} matches"
+    )
+
+    # Hold out whole businesses so both spellings of one stay together
+    businesses = sorted({expected for expected, *_ in samples})
+    random.Random(FIT_SETTINGS["seed"]).shuffle(businesses)
+    held_out = set(
+        businesses[: int(len(businesses) * FIT_SETTINGS["holdout"])]
+    )
+    train = [s for s in samples if s[0] not in held_out]
+    test = [s for s in samples if s[0] in held_out]
+
+    current = [RERANK_WEIGHTS["bias"]] + [
+        RERANK_WEIGHTS[name] for name in FITTED_FEATURES
+    ]
+    weights = fit_logistic(train, FIT_SETTINGS)
+    print("=" * 70)
+    report("current weights, held out", current, test)
+    report("fitted weights, held out", weights, test)
+
+    # The constants are refitted on every business
+    weights = fit_logistic(samples, FIT_SETTINGS)
+    print("=" * 70)
+    print("RERANK_WEIGHTS = {")
+    print(f'    "bias": {weights[0]:.2f},')
+    for name, weight in zip(FITTED_FEATURES, weights[1:]):
+        print(f'    "{name}": {weight:.2f},')
+    print(f'    "user_prior": {RERANK_WEIGHTS["user_prior"]},')
+    print("}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,14 @@ import csv
 from pathlib import Path
 from typing import List, Dict, Tuple
 
+# Matched columns of the user data extractors, scored only on rows with
+# ground truth
+USER_DATA_MATCH_COLUMNS = {
+    "e_categoryId_is_matched": "e_category_accuracy",
+    "e_labelsId_is_matched": "e_labels_accuracy",
+    "e_accountId_is_matched": "e_account_accuracy",
+}
+
 
 def _read_csv_text(csv_path: Path) -> Tuple[List[str], List[List[str]]]:
     """Read CSV file with encoding fallback."""
@@ -49,6 +57,36 @@ def calculate_accuracies(csv_path: Path) -> Dict[str, float]:
     header, rows = _read_csv_text(csv_path)
     if not header or not rows:
         raise ValueError(f"No data found in {csv_path}")
+    return _calculate_row_accuracies(header, rows)
+
+
+def calculate_version_accuracies(
+    csv_path: Path,
+) -> Dict[str, Dict[str, float]]:
+    """Calculate accuracies per combination of prompt versions."""
+    header, rows = _read_csv_text(csv_path)
+    if not header or not rows:
+        raise ValueError(f"No data found in {csv_path}")
+    if "prompt_versions" not in [h.strip().lower() for h in header]:
+        return {}
+
+    idx_prompt_versions = _idx(header, "prompt_versions")
+    groups: Dict[str, List[List[str]]] = {}
+    for row in rows:
+        versions = (
+            row[idx_prompt_versions] if idx_prompt_versions < len(row) else ""
+        )
+        groups.setdefault(versions, []).append(row)
+    return {
+        versions: _calculate_row_accuracies(header, group)
+        for versions, group in groups.items()
+    }
+
+
+def _calculate_row_accuracies(
+    header: List[str], rows: List[List[str]]
+) -> Dict[str, float]:
+    """Calculate accuracies of eval.csv rows."""
 
     # Get column indices
     idx_e_t_matched = _idx(header, "e_t_matched")
@@ -123,6 +161,20 @@ def calculate_accuracies(csv_path: Path) -> Dict[str, float]:
         ),
     }
 
+    lowered_header = [h.strip().lower() for h in header]
+    for column, metric_name in USER_DATA_MATCH_COLUMNS.items():
+        if column.lower() not in lowered_header:
+            continue
+        idx_column = _idx(header, column)
+        scored = [
+            row[idx_column]
+            for row in rows
+            if idx_column < len(row) and row[idx_column].strip()
+        ]
+        if scored:
+            matched = sum(_parse_bool(value) for value in scored)
+            accuracies[metric_name] = matched / len(scored)
+
     return accuracies
 
 
@@ -144,7 +196,10 @@ def main() -> None:
         "e_a_accuracy": "Amount accuracy",
         "e_b_accuracy": "Business accuracy",
         "e_b_precision": "Business average precision",
-        "is_b_best_match_accuracy": "LLL business match precision",
+        "is_b_best_match_accuracy": "Reranker business match precision",
+        "e_category_accuracy": "Category accuracy",
+        "e_labels_accuracy": "Labels accuracy",
+        "e_account_accuracy": "Account accuracy",
     }
 
     print("Metrics:")
@@ -153,6 +208,25 @@ def main() -> None:
         display_name = display_names.get(metric_name, metric_name)
         print(f"{display_name}: {value:.4f} ({value*100:.2f}%)")
     print("=" * 50)
+    if not any(
+        name in accuracies for name in USER_DATA_MATCH_COLUMNS.values()
+    ):
+        print(
+            "Category, labels and account are not scored: eval_data.csv "
+            "has no Category, Labels or Account column"
+        )
+        print("=" * 50)
+
+    # Compare prompt variants when the run served more than one
+    version_accuracies = calculate_version_accuracies(csv_path)
+    if len(version_accuracies) > 1:
+        for versions, group_accuracies in version_accuracies.items():
+            print(f"Prompt versions: {versions or 'unknown'}")
+            print("-" * 50)
+            for metric_name, value in group_accuracies.items():
+                display_name = display_names.get(metric_name, metric_name)
+                print(f"{display_name}: {value:.4f} ({value*100:.2f}%)")
+            print("=" * 50)
 
 
 if __name__ == "__main__":
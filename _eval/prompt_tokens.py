@@ -0,0 +1,117 @@
+import asyncio
+from typing import Callable, Dict, Tuple
+
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from src.endpoints import (
+    get_user_accounts,
+    get_user_categories,
+    get_user_labels,
+)
+from src.gpt import CHAT_SETTINGS
+from src.prompts import (
+    BUSINESS_PROMPT,
+    MAIN_PROMPT,
+    encode_accounts,
+    encode_categories,
+    encode_labels,
+    make_accounts_prompt,
+    make_categories_prompt,
+    make_datetime,
+    make_labels_prompt,
+)
+
+DEMO_USER_ID = 19
+CURRENT_TIME = "2025-09-16T14:54:19"
+
+
+def _load_tokenizer() -> Tuple[Callable[[str], int], str]:
+    """Return a token counter for the text model and its description.
+
+    There is no estimate to fall back to: Cyrillic text takes far more
+    tokens per character than English, so only real counts are reported.
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(CHAT_SETTINGS["text_model"])
+    except Exception as e:
+        # tiktoken is missing or cannot fetch its encoding files
+        raise SystemExit(
+            f"Cannot load the tokenizer of {CHAT_SETTINGS['text_model']}: "
+            f"{e!r}. Install requirements.txt, and allow tiktoken to "
+            "download its encoding or set TIKTOKEN_CACHE_DIR."
+        ) from e
+    return (
+        lambda text: len(encoding.encode(text)),
+        f"tiktoken {encoding.name}",
+    )
+
+
+def _demo_prompts() -> Dict[str, Tuple[str, str]]:
+    """Return every prompt and user context, before and after compaction."""
+
+    async def load():
+        return await asyncio.gather(
+            get_user_categories(DEMO_USER_ID),
+            get_user_labels(DEMO_USER_ID),
+            get_user_accounts(DEMO_USER_ID),
+        )
+
+    (categories, _), labels, accounts = asyncio.run(load())
+    datetime_prompt = make_datetime(CURRENT_TIME)
+    return {
+        "main": (MAIN_PROMPT, MAIN_PROMPT),
+        "business": (BUSINESS_PROMPT, BUSINESS_PROMPT),
+        "datetime": (datetime_prompt, datetime_prompt),
+        "categories": (
+            make_categories_prompt(categories, compact=False),
+            make_categories_prompt(categories, compact=True),
+        ),
+        "labels": (
+            make_labels_prompt(labels, compact=False),
+            make_labels_prompt(labels, compact=True),
+        ),
+        "accounts": (
+            make_accounts_prompt(accounts, compact=False),
+            make_accounts_prompt(accounts, compact=True),
+        ),
+        "context: categories": (
+            str(categories),
+            encode_categories(categories),
+        ),
+        "context: labels": (str(labels), encode_labels(labels)),
+        "context: accounts": (str(accounts), encode_accounts(accounts)),
+    }
+
+
+def main() -> None:
+    """Report prompt tokens of the demo user with and without compaction."""
+    count_tokens, tokenizer = _load_tokenizer()
+    prompts = _demo_prompts()
+
+    print(f"Tokenizer: {tokenizer}, demo user {DEMO_USER_ID}")
+    print("=" * 70)
+    print(f"{'prompt':<24} {'before':>8} {'compact':>8} {'saved':>8}")
+    total_before = total_after = 0
+    for name, (before, after) in prompts.items():
+        tokens_before = count_tokens(before)
+        tokens_after = count_tokens(after)
+        if not name.startswith("context"):
+            total_before += tokens_before
+            total_after += tokens_after
+        saved = 1 - tokens_after / tokens_before if tokens_before else 0
+        print(f"{name:<24} {tokens_before:>8} {tokens_after:>8} {saved:>8.1%}")
+    print("-" * 70)
+    print(
+        f"{'all prompts per request':<24} {total_before:>8} {total_after:>8} "
+        f"{1 - total_after / total_before:>8.1%}"
+    )
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
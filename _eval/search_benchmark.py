@@ -0,0 +1,259 @@
+import copy
+import json
+import sys
+import time
+import pathlib
+from pathlib import Path
+from statistics import quantiles
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from elasticsearch import helpers
+
+from _eval.metric import _idx, _read_csv_text
+from _helpers.elasticsearch.add_list import LIST_OF_BUSINESSES
+from elastic.business_enrichment import enrich_business
+from elastic.business_search import (
+    FUZINESS_SETTINGS,
+    NAME_SEARCH_FIELDS,
+    build_search_body,
+)
+from elastic.create_businesses_index import INDEX_CONFIG, NAME_FIELD_MAPPING
+from elastic.es_client import es, indexing_es
+from src.nlp.transliteration import (
+    has_cyrillic,
+    transliterate_english_to_ukrainian,
+    transliterate_ukrainian_to_english,
+)
+from logging_config import logger
+
+EVAL_DATA_FILE = Path(__file__).with_name("eval_data.csv")
+BUSINESSES_FILE = (
+    Path(__file__).resolve().parents[1]
+    / "_helpers"
+    / "elasticsearch"
+    / "api_businesses.json"
+)
+BENCHMARK_INDEX_PREFIX = "businesses_bench_"
+RECALL_AT = (1, 3, 5, 10)
+TOP_K = max(RECALL_AT)
+
+
+def _with_ngram_filter(filter_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy INDEX_CONFIG with a different ngram_filter definition."""
+    config = copy.deepcopy(INDEX_CONFIG)
+    analysis = config["settings"]["analysis"]
+    analysis["filter"]["ngram_filter"] = filter_config
+    gram_diff = filter_config["max_gram"] - filter_config["min_gram"]
+    config["settings"]["index"] = {"max_ngram_diff": max(gram_diff, 1)}
+    return config
+
+
+def _search_as_you_type_config() -> Dict[str, Any]:
+    """Copy INDEX_CONFIG with name fields indexed as search_as_you_type."""
+    config = copy.deepcopy(INDEX_CONFIG)
+    field_mapping = {
+        **copy.deepcopy(NAME_FIELD_MAPPING),
+        "type": "search_as_you_type",
+        "analyzer": "lowercase_analyzer",
+        "search_analyzer": "lowercase_analyzer",
+    }
+    for field in NAME_SEARCH_FIELDS:
+        config["mappings"]["properties"][field] = field_mapping
+    return config
+
+
+def _search_as_you_type_body(text: str, fuzziness_settings: dict) -> dict:
+    """Replace the n-gram clause with a bool_prefix search_as_you_type one."""
+    body = build_search_body(text, fuzziness_settings)
+    should = body["query"]["bool"]["should"]
+    should[0] = {
+        "multi_match": {
+            "query": text,
+            "type": "bool_prefix",
+            "fields": [
+                f"{field}{suffix}"
+                for field in NAME_SEARCH_FIELDS
+                for suffix in ("", "._2gram", "._3gram")
+            ],
+        }
+    }
+    return body
+
+
+# name : (index config, fuzziness table, query builder)
+BENCHMARK_CONFIGS: Dict[
+    str, Tuple[dict, dict, Callable[[str, dict], dict]]
+] = {
+    "baseline": (INDEX_CONFIG, FUZINESS_SETTINGS, build_search_body),
+    "ngram_3_5": (
+        _with_ngram_filter({"type": "ngram", "min_gram": 3, "max_gram": 5}),
+        FUZINESS_SETTINGS,
+        build_search_body,
+    ),
+    "edge_ngram_2_10": (
+        _with_ngram_filter(
+            {"type": "edge_ngram", "min_gram": 2, "max_gram": 10}
+        ),
+        FUZINESS_SETTINGS,
+        build_search_body,
+    ),
+    "search_as_you_type": (
+        _search_as_you_type_config(),
+        FUZINESS_SETTINGS,
+        _search_as_you_type_body,
+    ),
+    "fuzziness_strict": (
+        INDEX_CONFIG,
+        {8: 2, 5: 1, 4: 0},
+        build_search_body,
+    ),
+    "fuzziness_loose": (
+        INDEX_CONFIG,
+        {5: 2, 3: 1},
+        build_search_body,
+    ),
+}
+
+
+def _load_businesses() -> List[Dict[str, Any]]:
+    """Load the demo catalogue plus the manually added businesses."""
+    with open(BUSINESSES_FILE, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    next_id = max(record["id"] for record in records) + 1
+    for offset, (name_uk, name_en) in enumerate(LIST_OF_BUSINESSES):
+        records.append(
+            {
+                "id": next_id + offset,
+                "name": name_uk,
+                "nameUk": name_uk,
+                "nameEn": name_en,
+            }
+        )
+    return records
+
+
+def _load_queries() -> List[Tuple[str, str]]:
+    """Build (query, expected name) pairs from the Business column."""
+    header, rows = _read_csv_text(EVAL_DATA_FILE)
+    i_business = _idx(header, "Business")
+    queries = []
+    for row in rows:
+        expected = row[i_business].strip() if i_business < len(row) else ""
+        if not expected:
+            continue
+        # The name as written and as it is spelled when dictated
+        if has_cyrillic(expected):
+            spoken = transliterate_ukrainian_to_english(expected)
+        else:
+            spoken = transliterate_english_to_ukrainian(expected)
+        queries.append((expected, expected))
+        queries.append((spoken.lower(), expected))
+    return queries
+
+
+def _build_index(index: str, index_config: dict, records: list) -> int:
+    """Create and load a benchmark index, returning its size in bytes."""
+    if indexing_es.indices.exists(index=index):
+        indexing_es.indices.delete(index=index)
+    indexing_es.indices.create(index=index, body=index_config)
+    helpers.bulk(
+        indexing_es,
+        (
+            {
+                "_index": index,
+                "_id": record["id"],
+                "_source": enrich_business(record),
+            }
+            for record in records
+        ),
+    )
+    indexing_es.indices.refresh(index=index)
+    indexing_es.indices.forcemerge(index=index, max_num_segments=1)
+    stats = indexing_es.indices.stats(index=index, metric="store")
+    return stats["_all"]["primaries"]["store"]["size_in_bytes"]
+
+
+def _run_queries(
+    index: str,
+    fuzziness_settings: dict,
+    body_builder: Callable[[str, dict], dict],
+    queries: List[Tuple[str, str]],
+) -> Tuple[List[int], List[float]]:
+    """Run every query and return result ranks and latencies in ms."""
+    ranks, latencies = [], []
+    for query, expected in queries:
+        body = body_builder(query, fuzziness_settings)
+        started = time.perf_counter()
+        response = es.search(index=index, body=body, size=TOP_K)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        rank = 0
+        for position, hit in enumerate(response["hits"]["hits"], 1):
+            name = str(hit["_source"].get("name", "")).strip().lower()
+            if name == expected.lower():
+                rank = position
+                break
+        ranks.append(rank)
+    return ranks, latencies
+
+
+def _summarize(
+    ranks: List[int], latencies: List[float], size_bytes: int
+) -> Dict[str, float]:
+    """Calculate recall@k, MRR, index size and latency percentiles."""
+    total = len(ranks)
+    summary = {
+        f"recall@{k}": sum(1 for r in ranks if 0 < r <= k) / total
+        for k in RECALL_AT
+    }
+    summary["mrr"] = sum(1 / r for r in ranks if r) / total
+    summary["size_mb"] = size_bytes / 1024 / 1024
+    percentiles = quantiles(latencies, n=100)
+    summary["p50_ms"] = percentiles[49]
+    summary["p99_ms"] = percentiles[98]
+    return summary
+
+
+def benchmark_config(
+    name: str, records: list, queries: List[Tuple[str, str]]
+) -> Dict[str, float]:
+    """Build one candidate index, replay the queries and drop the index."""
+    index_config, fuzziness_settings, body_builder = BENCHMARK_CONFIGS[name]
+    index = f"{BENCHMARK_INDEX_PREFIX}{name}"
+    try:
+        size_bytes = _build_index(index, index_config, records)
+        # Warm caches with one unmeasured pass before timing
+        _run_queries(index, fuzziness_settings, body_builder, queries)
+        ranks, latencies = _run_queries(
+            index, fuzziness_settings, body_builder, queries
+        )
+    finally:
+        indexing_es.indices.delete(index=index, ignore_unavailable=True)
+    return _summarize(ranks, latencies, size_bytes)
+
+
+def main() -> None:
+    """Benchmark candidate index configurations on the eval businesses."""
+    names = sys.argv[1:] or list(BENCHMARK_CONFIGS)
+    records = _load_businesses()
+    queries = _load_queries()
+    logger.info(
+        f"Benchmarking {len(records)} businesses, {len(queries)} queries"
+    )
+
+    results = {}
+    for name in names:
+        logger.info(f"Running config: {name}")
+        results[name] = benchmark_config(name, records, queries)
+
+    columns = list(next(iter(results.values())))
+    print(f"{'config':<20}" + "".join(f"{c:>11}" for c in columns))
+    print("=" * (20 + 11 * len(columns)))
+    for name, summary in results.items():
+        print(f"{name:<20}" + "".join(f"{summary[c]:>11.3f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+import timeit
+from pathlib import Path
+from typing import Callable, List
+
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from transliterate import translit
+
+from src.nlp.transliteration import (
+    _transliterate_all,
+    transliterate_ukrainian_to_english,
+    transliterate_variants,
+)
+
+BUSINESSES_FILE = (
+    Path(__file__).resolve().parents[1]
+    / "_helpers"
+    / "elasticsearch"
+    / "api_businesses.json"
+)
+REPEATS = 5
+
+
+def _load_merchant_names() -> List[str]:
+    """Load every merchant name variant from the demo catalogue."""
+    with open(BUSINESSES_FILE, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    names = []
+    for record in records:
+        for key in ("name", "nameUk", "nameEn"):
+            if record.get(key):
+                names.append(record[key])
+    return names
+
+
+def _legacy_transliterate(text: str) -> str:
+    """Transliteration through the generic transliterate library."""
+    return translit(text, "uk", reversed=True).replace("'", "")
+
+
+def _time_per_name(
+    func: Callable[[str], object], names: List[str], clear_cache: bool
+) -> float:
+    """Return the best average time per name in microseconds."""
+
+    def run():
+        if clear_cache:
+            _transliterate_all.cache_clear()
+        for name in names:
+            func(name)
+
+    best = min(timeit.repeat(run, number=1, repeat=REPEATS))
+    return best / len(names) * 1e6
+
+
+def main() -> None:
+    """Compare the table-driven transliterator with the library one."""
+    names = _load_merchant_names()
+    results = {
+        "legacy (transliterate lib, 1 variant)": _time_per_name(
+            _legacy_transliterate, names, clear_cache=False
+        ),
+        "tables, kmu2010 only (cold cache)": _time_per_name(
+            transliterate_ukrainian_to_english, names, clear_cache=True
+        ),
+        "tables, all variants (cold cache)": _time_per_name(
+            transliterate_variants, names, clear_cache=True
+        ),
+        "tables, all variants (warm cache)": _time_per_name(
+            transliterate_variants, names, clear_cache=False
+        ),
+    }
+
+    baseline = next(iter(results.values()))
+    print(f"Merchant names: {len(names)}, best of {REPEATS} runs")
+    print("=" * 70)
+    for label, micros in results.items():
+        print(f"{label:<42} {micros:8.2f} us/name  x{baseline / micros:.1f}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
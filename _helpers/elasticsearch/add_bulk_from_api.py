@@ -1,30 +1,16 @@
 import os
-import httpx
-from elasticsearch import helpers
-
 import sys
 from pathlib import Path
 
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
-from elastic.es_client import es, INDEX_NAME
+from _helpers.elasticsearch.bulk_loader import iter_json_url
+from _helpers.elasticsearch.rebuild_index import rebuild_index
 
 BUSINESSES_API_RETRIEVAL_URL = os.getenv("BUSINESSES_API_RETRIEVAL_URL")
 
 
-def fetch_from_api():
-    """Fetch businesses data from API endpoint."""
-    response = httpx.get(BUSINESSES_API_RETRIEVAL_URL)
-    response.raise_for_status()
-    return response.json()
-
-
-# Generator for streaming documents
-def actions():
-    """Generate Elasticsearch actions for bulk indexing."""
-    for record in fetch_from_api():
-        yield {"_index": INDEX_NAME, "_id": record["id"], "_source": record}
-
-
-# Bulk insert (streamed in batches)
-helpers.bulk(es, actions())
+if __name__ == "__main__":
+    # Stream the API response into a new index version and swap the alias
+    if not rebuild_index(iter_json_url(BUSINESSES_API_RETRIEVAL_URL)):
+        sys.exit(1)
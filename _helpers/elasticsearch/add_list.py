@@ -7,7 +7,55 @@ from pathlib import Path
 
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
-from elastic.es_client import es, INDEX_NAME
+from elastic.es_client import indexing_es, INDEX_NAME
+from elastic.business_enrichment import enrich_business
+
+LIST_OF_BUSINESSES = [
+    ["Ябко", "Jabko"],
+    ["Que Pasa", "Que Pasa"],
+    ["1001 + 1 NIGHT RESTAURANT", "1001 + 1 NIGHT RESTAURANT"],
+    ["Китайський привіт", "China Hi"],
+    ["ФОКСТРОТ", "Foxtrot"],
+    ["Техно Світ", "Techno Svit"],
+    ["Сушія", "Sushiya"],
+    ["Allo", "Allo"],
+    ["Starbucks", "Starbucks"],
+    ["Мобілочка", "Mobilochka"],
+    ["Papa John's", "Papa John's"],
+    ["Червоний мак", "Chervonyi Mak"],
+    ["Di Napoli", "Di Napoli"],
+    ["ТехноПарк", "TechnoPark"],
+    ["Coffee Time", "Coffee Time"],
+    # ["Domino's Pizza", "Domino's Pizza"],
+    ["Гаджетаріум", "Gadgetarium"],
+    ["ТехноМаг", "TechnoMag"],
+    ["Кавова Хмаринка", "Coffee Cloud"],
+    ["Sushi 3303", "Sushi 3303"],
+    ["Гаджет Зона", "Gadget Zone"],
+    ["Чорний кіт", "Chornyi Kit"],
+    ["ТехноLand", "TechnoLand"],
+    ["La Varena", "La Varena"],
+    ["Mediterre", "Mediterre"],
+    ["Техносито", "Technosito"],
+    ["Кавова Перерва", "Coffee Break"],
+    ["Зелене яблуко", "Zelene Yabluko"],
+    ["Япона дім", "Japona dim"],
+    ["QuickyTech", "QuickyTech"],
+    ["Сімпсон", "Simpson"],
+    ["Pizza King", "Pizza King"],
+    ["Гaджетик", "Gadgetik"],
+    ["Solodkyi Kutok", "Solodkyi Kutok"],
+    ["ТехноХаус", "TechnoHouse"],
+    ["Italian Courtyard", "Italian Courtyard"],
+    ["BooKiss", "BooKiss"],
+    ["WOK", "WOK"],
+    ["Техномаркет", "Technomarket"],
+    ["China Лавка", "China Lavka"],
+    ["екпеліарМусс", "ekspeliarMuss"],
+    ["ГаджетМолл", "GadgetMall"],
+    ["Red Gragon", "Red Gragon"],
+    ["Apple Room", "Apple Room"],
+]
 
 
 def generate_slug(name):
@@ -43,24 +91,26 @@ def add_businesses_to_index(business_list):
             yield {
                 "_index": INDEX_NAME,
                 "_id": str(business_id),
-                "_source": {
-                    "id": business_id,
-                    "createdAt": now,
-                    "updatedAt": now,
-                    "name": name_uk,
-                    "type": "commerce",
-                    "slug": slug,
-                    "_slug": "slug",
-                    "nameUk": name_uk,
-                    "_nameUk": "nameUk",
-                    "nameEn": name_en,
-                    "_nameEn": "nameEn",
-                },
+                "_source": enrich_business(
+                    {
+                        "id": business_id,
+                        "createdAt": now,
+                        "updatedAt": now,
+                        "name": name_uk,
+                        "type": "commerce",
+                        "slug": slug,
+                        "_slug": "slug",
+                        "nameUk": name_uk,
+                        "_nameUk": "nameUk",
+                        "nameEn": name_en,
+                        "_nameEn": "nameEn",
+                    }
+                ),
             }
 
     # Bulk insert
     try:
-        result = helpers.bulk(es, actions())
+        result = helpers.bulk(indexing_es, actions())
         print(f"Successfully added {result[0]} businesses to index")
         return result
     except Exception as e:
@@ -69,51 +119,4 @@ def add_businesses_to_index(business_list):
 
 
 if __name__ == "__main__":
-    LIST_OF_BUSINESSES = [
-        ["Ябко", "Jabko"],
-        ["Que Pasa", "Que Pasa"],
-        ["1001 + 1 NIGHT RESTAURANT", "1001 + 1 NIGHT RESTAURANT"],
-        ["Китайський привіт", "China Hi"],
-        ["ФОКСТРОТ", "Foxtrot"],
-        ["Техно Світ", "Techno Svit"],
-        ["Сушія", "Sushiya"],
-        ["Allo", "Allo"],
-        ["Starbucks", "Starbucks"],
-        ["Мобілочка", "Mobilochka"],
-        ["Papa John's", "Papa John's"],
-        ["Червоний мак", "Chervonyi Mak"],
-        ["Di Napoli", "Di Napoli"],
-        ["ТехноПарк", "TechnoPark"],
-        ["Coffee Time", "Coffee Time"],
-        # ["Domino's Pizza", "Domino's Pizza"],
-        ["Гаджетаріум", "Gadgetarium"],
-        ["ТехноМаг", "TechnoMag"],
-        ["Кавова Хмаринка", "Coffee Cloud"],
-        ["Sushi 3303", "Sushi 3303"],
-        ["Гаджет Зона", "Gadget Zone"],
-        ["Чорний кіт", "Chornyi Kit"],
-        ["ТехноLand", "TechnoLand"],
-        ["La Varena", "La Varena"],
-        ["Mediterre", "Mediterre"],
-        ["Техносито", "Technosito"],
-        ["Кавова Перерва", "Coffee Break"],
-        ["Зелене яблуко", "Zelene Yabluko"],
-        ["Япона дім", "Japona dim"],
-        ["QuickyTech", "QuickyTech"],
-        ["Сімпсон", "Simpson"],
-        ["Pizza King", "Pizza King"],
-        ["Гaджетик", "Gadgetik"],
-        ["Solodkyi Kutok", "Solodkyi Kutok"],
-        ["ТехноХаус", "TechnoHouse"],
-        ["Italian Courtyard", "Italian Courtyard"],
-        ["BooKiss", "BooKiss"],
-        ["WOK", "WOK"],
-        ["Техномаркет", "Technomarket"],
-        ["China Лавка", "China Lavka"],
-        ["екпеліарМусс", "ekspeliarMuss"],
-        ["ГаджетМолл", "GadgetMall"],
-        ["Red Gragon", "Red Gragon"],
-        ["Apple Room", "Apple Room"],
-    ]
-
     add_businesses_to_index(LIST_OF_BUSINESSES)
@@ -0,0 +1,223 @@
+"""Streaming, parallel bulk loading of businesses into Elasticsearch."""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from elasticsearch import helpers
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from elastic.create_businesses_index import get_alias_indices
+from elastic.es_client import indexing_es, INDEX_NAME
+from elastic.business_enrichment import enrich_business
+from logging_config import logger
+
+load_dotenv()
+
+BULK_SETTINGS = {
+    "chunk_size": int(os.getenv("BULK_CHUNK_SIZE", 500)),  # docs per request
+    "concurrency": int(os.getenv("BULK_CONCURRENCY", 4)),  # parallel requests
+    "max_retries": 5,  # retries of documents rejected with 429
+    "initial_backoff": 1,  # seconds, doubled on every retry
+    "read_size": 64 * 1024,  # characters read from the source at once
+}
+
+# Index settings that slow down a full load, restored afterwards. Only
+# applied to an index not yet behind the alias: searches on a live index
+# would lose their replicas and stop seeing new documents meanwhile
+LOAD_INDEX_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+_JSON_SEPARATORS = " \t\r\n,"
+
+
+def iter_json_array(chunks):
+    """Yield the items of a JSON array from an iterable of text chunks."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in (
+                _JSON_SEPARATORS
+            ):
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # item is incomplete, wait for the next chunk
+            yield item
+        buffer = buffer[position:]
+    raise ValueError("Unexpected end of JSON array")
+
+
+def iter_json_file(path, read_size=BULK_SETTINGS["read_size"]):
+    """Stream the records of a JSON array file."""
+
+    def chunks():
+        with open(path, "r", encoding="utf-8") as f:
+            while chunk := f.read(read_size):
+                yield chunk
+
+    return iter_json_array(chunks())
+
+
+def iter_json_url(url, read_size=BULK_SETTINGS["read_size"]):
+    """Stream the records of a JSON array returned by an HTTP endpoint."""
+    with httpx.stream("GET", url, timeout=60) as response:
+        response.raise_for_status()
+        yield from iter_json_array(response.iter_text(read_size))
+
+
+def _index_chunk(actions, max_retries, initial_backoff):
+    """Index one chunk, retrying rejected documents with backoff."""
+    failed = []
+    for ok, item in helpers.streaming_bulk(
+        indexing_es,
+        actions,
+        chunk_size=len(actions),
+        max_retries=max_retries,
+        initial_backoff=initial_backoff,
+        raise_on_error=False,
+        yield_ok=False,
+    ):
+        failed.append(item)
+    return len(actions) - len(failed), failed
+
+
+def _get_index_settings(index):
+    """Read the current values of the settings changed during a load."""
+    response = indexing_es.indices.get_settings(
+        index=index, flat_settings=True
+    )
+    settings = next(iter(response.values()))["settings"]
+    return {
+        name: settings.get(f"index.{name}") for name in LOAD_INDEX_SETTINGS
+    }
+
+
+def _is_live(index):
+    """Check if an index is the alias or one of the indexes behind it."""
+    return index == INDEX_NAME or index in get_alias_indices()
+
+
+def bulk_load(
+    records,
+    index=INDEX_NAME,
+    chunk_size=BULK_SETTINGS["chunk_size"],
+    concurrency=BULK_SETTINGS["concurrency"],
+    max_retries=BULK_SETTINGS["max_retries"],
+    initial_backoff=BULK_SETTINGS["initial_backoff"],
+):
+    """Index records with parallel bulk requests and return the counts.
+
+    Refreshes and replicas are turned off during the load unless the index
+    is live; full reloads should go through rebuild_index instead.
+    """
+    original_settings = None
+    if _is_live(index):
+        logger.warning(
+            f"Loading into the live index '{index}' with its usual settings"
+        )
+    else:
+        original_settings = _get_index_settings(index)
+        indexing_es.indices.put_settings(
+            index=index, settings=LOAD_INDEX_SETTINGS
+        )
+
+    actions = (
+        {
+            "_index": index,
+            "_id": record["id"],
+            "_source": enrich_business(record),
+        }
+        for record in records
+    )
+
+    indexed, failed = 0, []
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            while chunk := list(islice(actions, chunk_size)):
+                # Bound memory: at most two chunks queued per worker
+                if len(pending) >= concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        chunk_indexed, chunk_failed = future.result()
+                        indexed += chunk_indexed
+                        failed.extend(chunk_failed)
+                pending.add(
+                    executor.submit(
+                        _index_chunk, chunk, max_retries, initial_backoff
+                    )
+                )
+            for future in pending:
+                chunk_indexed, chunk_failed = future.result()
+                indexed += chunk_indexed
+                failed.extend(chunk_failed)
+    finally:
+        if original_settings is not None:
+            indexing_es.indices.put_settings(
+                index=index, settings=original_settings
+            )
+        indexing_es.indices.refresh(index=index)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Indexed {indexed} businesses into '{index}' in {elapsed:.1f}s "
+        f"({indexed / elapsed if elapsed else 0:.0f} docs/sec), "
+        f"{len(failed)} failed"
+    )
+    for item in failed[:10]:
+        logger.error(f"Failed to index business: {item}")
+    return indexed, failed
+
+
+def main():
+    """Load businesses from a JSON file or the businesses API."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", type=Path, help="JSON array of businesses")
+    source.add_argument("--url", help="API endpoint returning a JSON array")
+    parser.add_argument("--index", default=INDEX_NAME)
+    parser.add_argument(
+        "--chunk-size", type=int, default=BULK_SETTINGS["chunk_size"]
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=BULK_SETTINGS["concurrency"]
+    )
+    args = parser.parse_args()
+
+    records = (
+        iter_json_file(args.file) if args.file else iter_json_url(args.url)
+    )
+    bulk_load(
+        records,
+        index=args.index,
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
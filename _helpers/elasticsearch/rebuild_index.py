@@ -0,0 +1,136 @@
+"""Rebuild the businesses index as a new version and swap the alias."""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from _helpers.elasticsearch.bulk_loader import (
+    bulk_load,
+    iter_json_file,
+    iter_json_url,
+)
+from elastic.business_search import build_search_body
+from elastic.create_businesses_index import (
+    create_index_version,
+    get_index_versions,
+    prune_index_versions,
+    swap_alias,
+)
+from elastic.es_client import indexing_es, INDEX_NAME
+from logging_config import logger
+
+REBUILD_SETTINGS = {
+    "keep_versions": 2,  # physical versions kept for rollback
+    "min_doc_ratio": 0.95,  # new doc count relative to the live index
+    "sample_size": 20,  # businesses searched by name before the swap
+    "min_sample_recall": 0.9,  # share of samples found in the top 10
+}
+
+
+def sample_businesses(index: str, size: int) -> list:
+    """Pick random businesses from an index for sample queries."""
+    response = indexing_es.search(
+        index=index,
+        size=size,
+        query={
+            "function_score": {
+                "query": {"match_all": {}},
+                "random_score": {},
+            }
+        },
+        source=["id", "name"],
+    )
+    return [hit["_source"] for hit in response["hits"]["hits"]]
+
+
+def run_sample_queries(index: str, samples: list) -> float:
+    """Search every sample by name and return the share found in top 10."""
+    found = 0
+    for sample in samples:
+        response = indexing_es.search(
+            index=index,
+            body={
+                **build_search_body(sample["name"]),
+                "size": 10,
+                "_source": ["id"],
+            },
+        )
+        hit_ids = [hit["_source"]["id"] for hit in response["hits"]["hits"]]
+        found += sample["id"] in hit_ids
+    return found / len(samples) if samples else 0.0
+
+
+def verify_index(
+    index: str, previous_count: int, samples: list, settings: dict
+) -> bool:
+    """Check doc counts and sample query recall of a new index version."""
+    count = indexing_es.count(index=index)["count"]
+    if count == 0 or count < previous_count * settings["min_doc_ratio"]:
+        logger.error(
+            f"Index '{index}' has {count} businesses, "
+            f"live index has {previous_count}"
+        )
+        return False
+
+    recall = run_sample_queries(index, samples)
+    if recall < settings["min_sample_recall"]:
+        logger.error(
+            f"Index '{index}' found {recall:.0%} of sample businesses"
+        )
+        return False
+
+    logger.info(
+        f"Index '{index}' verified: {count} businesses, "
+        f"{recall:.0%} of samples found"
+    )
+    return True
+
+
+def rebuild_index(records, settings: dict = REBUILD_SETTINGS) -> bool:
+    """Load a new index version and swap the alias once it is verified."""
+    previous_count = (
+        indexing_es.count(index=INDEX_NAME)["count"]
+        if indexing_es.indices.exists(index=INDEX_NAME)
+        else 0
+    )
+    version = max(get_index_versions(), default=0) + 1
+    index = create_index_version(version)
+
+    bulk_load(records, index=index)
+
+    # Warm the new index with one pass before the verified pass
+    samples = sample_businesses(index, settings["sample_size"])
+    run_sample_queries(index, samples)
+
+    if not verify_index(index, previous_count, samples, settings):
+        logger.error(f"Alias '{INDEX_NAME}' left unchanged, '{index}' kept")
+        return False
+
+    swap_alias(index)
+    prune_index_versions(settings["keep_versions"])
+    return True
+
+
+def main():
+    """Rebuild the businesses index from a JSON file or the API."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", type=Path, help="JSON array of businesses")
+    source.add_argument("--url", help="API endpoint returning a JSON array")
+    parser.add_argument(
+        "--keep", type=int, default=REBUILD_SETTINGS["keep_versions"]
+    )
+    args = parser.parse_args()
+
+    records = (
+        iter_json_file(args.file) if args.file else iter_json_url(args.url)
+    )
+    settings = {**REBUILD_SETTINGS, "keep_versions": args.keep}
+    if not rebuild_index(records, settings):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
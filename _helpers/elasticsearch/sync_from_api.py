@@ -0,0 +1,249 @@
+"""Incrementally sync businesses changed in the API since the last run."""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from elasticsearch import helpers
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from elastic.business_enrichment import enrich_business
+from elastic.create_businesses_index import bump_catalogue_generation
+from elastic.es_client import indexing_es, INDEX_NAME
+from logging_config import logger
+
+load_dotenv()
+
+BUSINESSES_API_RETRIEVAL_URL = os.getenv("BUSINESSES_API_RETRIEVAL_URL")
+SYNC_STATE_FILE = Path(
+    os.getenv(
+        "BUSINESS_SYNC_STATE_FILE", Path(__file__).with_name("sync_state.json")
+    )
+)
+
+SYNC_SETTINGS = {
+    "page_size": 500,  # records requested per API page
+    # Keyset pagination: records sorted by (updatedAt, id) after a cursor,
+    # so changes made during a sync move behind it instead of shifting pages
+    "updated_param": "updatedAfter",  # API filter on updatedAt, inclusive
+    "after_id_param": "afterId",  # with updatedAfter, ids after the cursor
+    "sort_param": "sort",
+    "sort": "updatedAt,id",
+    "limit_param": "limit",
+    "timeout": 60,  # seconds per API request
+    # Hard deletes leave no record behind, so with --interval the indexed
+    # ids are compared with the API ids every this many syncs
+    "reconcile_every": 12,
+}
+
+
+def load_watermark():
+    """Return the updatedAt of the last synced change, if any."""
+    if SYNC_STATE_FILE.exists():
+        with open(SYNC_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f).get("updatedAt")
+
+    # No state yet (e.g. after a full load): start from the index itself
+    response = indexing_es.search(
+        index=INDEX_NAME,
+        size=0,
+        aggs={"updatedAt": {"max": {"field": "updatedAt"}}},
+    )
+    return response["aggregations"]["updatedAt"].get("value_as_string")
+
+
+def save_watermark(updated_at):
+    """Persist the updatedAt of the last synced change."""
+    with open(SYNC_STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"updatedAt": updated_at}, f)
+
+
+def _record_cursor(record):
+    """Return the (updatedAt, id) keyset position of a record."""
+    return record.get("updatedAt") or "", record["id"]
+
+
+def iter_changed_records(updated_after, url=BUSINESSES_API_RETRIEVAL_URL):
+    """Yield records updated at or after the watermark, in keyset order.
+
+    Every page continues after the (updatedAt, id) of the last record. A
+    record updated meanwhile sorts after the cursor, so it is yielded later
+    in the same run or in the next one, instead of being skipped.
+    """
+    cursor = None
+    with httpx.Client(timeout=SYNC_SETTINGS["timeout"]) as client:
+        while True:
+            params = {
+                SYNC_SETTINGS["sort_param"]: SYNC_SETTINGS["sort"],
+                SYNC_SETTINGS["limit_param"]: SYNC_SETTINGS["page_size"],
+            }
+            if cursor:
+                params[SYNC_SETTINGS["updated_param"]] = cursor[0]
+                params[SYNC_SETTINGS["after_id_param"]] = cursor[1]
+            elif updated_after:
+                params[SYNC_SETTINGS["updated_param"]] = updated_after
+            response = client.get(url, params=params)
+            response.raise_for_status()
+            records = response.json()
+            # The cursor is inclusive on updatedAt alone; skip what was seen
+            new_records = [
+                record
+                for record in records
+                if cursor is None or _record_cursor(record) > cursor
+            ]
+            yield from new_records
+            if len(records) < SYNC_SETTINGS["page_size"]:
+                return
+            if not new_records:
+                raise RuntimeError(
+                    f"Business API page after {cursor} made no progress, "
+                    f"check that it supports the "
+                    f"'{SYNC_SETTINGS['after_id_param']}' cursor"
+                )
+            cursor = max(cursor or ("", -1), *map(_record_cursor, records))
+
+
+def _sync_action(record):
+    """Build an upsert, or a delete for soft-deleted records."""
+    if record.get("deletedAt"):
+        return {
+            "_op_type": "delete",
+            "_index": INDEX_NAME,
+            "_id": record["id"],
+        }
+    return {
+        "_index": INDEX_NAME,
+        "_id": record["id"],
+        "_source": enrich_business(record),
+    }
+
+
+def sync_businesses(url=BUSINESSES_API_RETRIEVAL_URL):
+    """Apply API changes since the watermark and return the counts."""
+    watermark = load_watermark()
+    latest = watermark
+    changes = {"indexed": 0, "deleted": 0, "failed": 0}
+
+    def actions():
+        nonlocal latest
+        # Inclusive watermark: records sharing its timestamp are re-applied,
+        # which is harmless because every action is idempotent
+        for record in iter_changed_records(watermark, url):
+            updated_at = record.get("updatedAt")
+            if updated_at and (latest is None or updated_at > latest):
+                latest = updated_at
+            yield _sync_action(record)
+
+    for ok, item in helpers.streaming_bulk(
+        indexing_es, actions(), raise_on_error=False, raise_on_exception=False
+    ):
+        op_type, result = next(iter(item.items()))
+        if ok:
+            changes["indexed" if op_type == "index" else "deleted"] += 1
+        elif op_type == "delete" and result.get("status") == 404:
+            continue  # deleted before it was ever indexed
+        else:
+            changes["failed"] += 1
+            logger.error(f"Failed to sync business: {item}")
+
+    # Search caches live in the serving processes, signal them through ES
+    if changes["indexed"] or changes["deleted"]:
+        bump_catalogue_generation()
+    # Keep the old watermark if anything failed so it is retried next run
+    if not changes["failed"] and latest != watermark:
+        save_watermark(latest)
+
+    logger.info(
+        f"Synced businesses since {watermark}: {changes['indexed']} upserted, "
+        f"{changes['deleted']} deleted, {changes['failed']} failed"
+    )
+    return changes
+
+
+def reconcile_deleted(url=BUSINESSES_API_RETRIEVAL_URL):
+    """Delete indexed businesses that no longer exist in the API.
+
+    Records removed from the API without a deletedAt never show up as a
+    change, so they are found by comparing every id. Returns the count.
+    """
+    api_ids = {
+        str(record["id"])
+        for record in iter_changed_records(None, url)
+        if not record.get("deletedAt")
+    }
+    # An empty or failed listing must not wipe the catalogue
+    if not api_ids:
+        logger.warning("Business API returned no records, not reconciling")
+        return 0
+
+    indexed_ids = {
+        hit["_id"]
+        for hit in helpers.scan(
+            indexing_es,
+            index=INDEX_NAME,
+            query={"query": {"match_all": {}}},
+            _source=False,
+        )
+    }
+    removed = sorted(indexed_ids - api_ids)
+    deleted = 0
+    for ok, item in helpers.streaming_bulk(
+        indexing_es,
+        (
+            {"_op_type": "delete", "_index": INDEX_NAME, "_id": business_id}
+            for business_id in removed
+        ),
+        raise_on_error=False,
+        raise_on_exception=False,
+    ):
+        if ok:
+            deleted += 1
+        else:
+            logger.error(f"Failed to delete business: {item}")
+
+    if deleted:
+        bump_catalogue_generation()
+    logger.info(f"Removed {deleted} businesses missing from the API")
+    return deleted
+
+
+def main():
+    """Sync once, or every --interval seconds."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=BUSINESSES_API_RETRIEVAL_URL)
+    parser.add_argument(
+        "--interval", type=float, help="seconds between syncs, runs forever"
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="also remove businesses hard-deleted in the API",
+    )
+    args = parser.parse_args()
+
+    syncs = 0
+    while True:
+        try:
+            sync_businesses(args.url)
+            if args.reconcile or (
+                args.interval and syncs % SYNC_SETTINGS["reconcile_every"] == 0
+            ):
+                reconcile_deleted(args.url)
+        except Exception as e:
+            if not args.interval:
+                raise
+            logger.error(f"Error syncing businesses: {e}")
+        if not args.interval:
+            return
+        syncs += 1
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
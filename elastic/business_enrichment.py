@@ -0,0 +1,77 @@
+"""Index-time name variants for businesses."""
+
+import re
+
+from src.nlp.phonetic import phonetic_keys
+from src.nlp.transliteration import (
+    has_cyrillic,
+    transliterate_english_to_ukrainian,
+    transliterate_ukrainian_to_english,
+    transliterate_variants,
+)
+
+NAME_FIELDS = ("name", "nameUk", "nameEn")
+
+# Branch suffixes: "на Подолі", "у Франківську", "#2", "№ 3", ", 10"
+_BRANCH_LOCATION_RE = re.compile(r"\s+(?:на|у|в|na|u|v)\s+[A-ZА-ЯІЇЄҐ].*$")
+_BRANCH_NUMBER_RE = re.compile(r"\s*(?:#|№)\s*\d+\s*$")
+_BRANCH_ADDRESS_RE = re.compile(r",\s+\d+\w*\s*$")
+_BRAND_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+
+def get_business_names(record: dict) -> list:
+    """Return the distinct non-empty names of a business record."""
+    names = []
+    for field in NAME_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str) and value.strip() and value not in names:
+            names.append(value)
+    return names
+
+
+def brand_key(name: str) -> str:
+    """Normalize a branch name to its brand, or return "" for other names.
+
+    Only names with a branch suffix are clustered: "Мрія" and "Кафе Мрія"
+    may well be unrelated businesses, "Мрія на Подолі" and "Мрія #2" are
+    branches of one brand.
+    """
+    name = name.strip()
+    brand = _BRANCH_ADDRESS_RE.sub("", name)
+    brand = _BRANCH_LOCATION_RE.sub("", brand)
+    brand = _BRANCH_NUMBER_RE.sub("", brand)
+    if brand == name:
+        return ""
+
+    key = brand.lower().replace("ʼ", "'").replace("’", "'")
+    key = _BRAND_NON_WORD_RE.sub("", key)
+    if has_cyrillic(key):
+        key = transliterate_ukrainian_to_english(key).lower()
+    return " ".join(key.split())
+
+
+def enrich_business(record: dict) -> dict:
+    """Add transliterations, phonetic keys and the brand to a record."""
+    names = get_business_names(record)
+    latin, cyrillic, phonetic = set(), set(), set()
+
+    for name in names:
+        if has_cyrillic(name):
+            latin.update(transliterate_variants(name).values())
+        else:
+            cyrillic.add(transliterate_english_to_ukrainian(name))
+        phonetic.update(phonetic_keys(name))
+
+    return {
+        **record,
+        "nameTranslit": sorted(latin.difference(names)),
+        "nameCyrillic": sorted(cyrillic.difference(names)),
+        "namePhonetic": sorted(phonetic),
+        # branches of one brand share it and are collapsed in search; a
+        # brand provided by the source wins over the one from the name
+        "brandId": str(
+            record.get("brandId")
+            or brand_key(record.get("name") or "")
+            or record["id"]
+        ),
+    }
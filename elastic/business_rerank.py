@@ -0,0 +1,171 @@
+"""Local reranking of business search candidates by string similarity."""
+
+import math
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from src.nlp.phonetic import phonetic_key, phonetic_keys
+from src.nlp.transliteration import has_cyrillic, transliterate_variants
+
+# Logistic calibration: probability = sigmoid(bias + sum(weight * feature)).
+# Fitted on the eval businesses by _eval/fit_rerank.py, except user_prior,
+# which that data does not cover and is set by hand
+RERANK_WEIGHTS = {
+    "bias": -8.04,
+    "jaro_winkler": 1.36,
+    "token_set_ratio": 3.76,
+    "phonetic": 4.64,
+    "search_confidence": 0.10,
+    "user_prior": 1.0,
+}
+MIN_BEST_MATCH_PROBABILITY = 0.5
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+
+@lru_cache(maxsize=4096)
+def _latin_forms(text: str) -> tuple:
+    """Return the lowercase Latin spellings of a name for comparison."""
+    text = _NON_WORD_RE.sub("", text.lower()).strip()
+    if not text:
+        return ()
+    if has_cyrillic(text):
+        return tuple(set(transliterate_variants(text).values()))
+    return (text,)
+
+
+def jaro_winkler(first: str, second: str, prefix_scale: float = 0.1) -> float:
+    """Calculate Jaro-Winkler similarity between two strings."""
+    if first == second:
+        return 1.0
+    if not first or not second:
+        return 0.0
+
+    window = max(max(len(first), len(second)) // 2 - 1, 0)
+    first_matched = [False] * len(first)
+    second_matched = [False] * len(second)
+    matches = 0
+    for i, letter in enumerate(first):
+        start, end = max(0, i - window), min(i + window + 1, len(second))
+        for j in range(start, end):
+            if not second_matched[j] and second[j] == letter:
+                first_matched[i] = second_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+
+    first_letters = [c for c, m in zip(first, first_matched) if m]
+    second_letters = [c for c, m in zip(second, second_matched) if m]
+    transpositions = (
+        sum(a != b for a, b in zip(first_letters, second_letters)) / 2
+    )
+    jaro = (
+        matches / len(first)
+        + matches / len(second)
+        + (matches - transpositions) / matches
+    ) / 3
+
+    prefix = 0
+    for a, b in zip(first[:4], second[:4]):
+        if a != b:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+
+def token_set_ratio(first: str, second: str) -> float:
+    """Compare strings by their shared and remaining word sets (0..1)."""
+    first_tokens, second_tokens = set(first.split()), set(second.split())
+    if not first_tokens or not second_tokens:
+        return 0.0
+    common = " ".join(sorted(first_tokens & second_tokens))
+    first_rest = " ".join(sorted(first_tokens - second_tokens))
+    second_rest = " ".join(sorted(second_tokens - first_tokens))
+    first_full = f"{common} {first_rest}".strip()
+    second_full = f"{common} {second_rest}".strip()
+    pairs = (
+        (common, first_full),
+        (common, second_full),
+        (first_full, second_full),
+    )
+    return max(SequenceMatcher(None, a, b).ratio() for a, b in pairs if a)
+
+
+def _phonetic_agreement(query_keys: set, name: str) -> float:
+    """Score how well the name sounds like any of the query values."""
+    if not query_keys:
+        return 0.0
+    name_key = phonetic_key(name)
+    if name_key in query_keys:
+        return 1.0
+    # A query matching the leading words of the name (brand of a branch)
+    if query_keys & phonetic_keys(name):
+        return 0.5
+    return 0.0
+
+
+def _probability(features: dict) -> float:
+    """Turn candidate features into a calibrated match probability."""
+    logit = RERANK_WEIGHTS["bias"] + sum(
+        RERANK_WEIGHTS[name] * value for name, value in features.items()
+    )
+    return 1 / (1 + math.exp(-logit))
+
+
+def _query_signature(query_values: list) -> tuple:
+    """Return the Latin forms and phonetic keys of the query values."""
+    query_forms = {
+        form for value in query_values if value for form in _latin_forms(value)
+    }
+    query_keys = {phonetic_key(value) for value in query_values if value}
+    query_keys.discard("")
+    return query_forms, query_keys
+
+
+def candidate_features(
+    query_forms: set, query_keys: set, candidate: dict
+) -> dict:
+    """Return the features of one candidate, named as in RERANK_WEIGHTS."""
+    name = str(candidate.get("name", ""))
+    name_forms = _latin_forms(name)
+    return {
+        "jaro_winkler": max(
+            (jaro_winkler(q, n) for q in query_forms for n in name_forms),
+            default=0.0,
+        ),
+        "token_set_ratio": max(
+            (token_set_ratio(q, n) for q in query_forms for n in name_forms),
+            default=0.0,
+        ),
+        "phonetic": _phonetic_agreement(query_keys, name),
+        "search_confidence": candidate.get("confidence") or 0.0,
+        # how often the user confirmed this business before
+        "user_prior": candidate.get("prior") or 0.0,
+    }
+
+
+def rerank_businesses(query_values: list, candidates: list) -> list:
+    """Score candidates against the extracted business and its variants."""
+    query_forms, query_keys = _query_signature(query_values)
+    if not query_forms or not candidates:
+        return list(candidates)
+
+    reranked = []
+    for candidate in candidates:
+        features = candidate_features(query_forms, query_keys, candidate)
+        reranked.append(
+            {**candidate, "probability": round(_probability(features), 4)}
+        )
+
+    return sorted(reranked, key=lambda c: c["probability"], reverse=True)
+
+
+def best_business_match(reranked: list):
+    """Return the top reranked business if it is a confident match."""
+    if reranked and reranked[0].get("probability", 0.0) >= (
+        MIN_BEST_MATCH_PROBABILITY
+    ):
+        return reranked[0]
+    return None
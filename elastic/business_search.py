@@ -1,71 +1,495 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from elasticsearch import ApiError, ConnectionError, ConnectionTimeout
+
+import metrics
+from logging_config import logger
+from resilience import BREAKER_SETTINGS, Bulkhead, CircuitBreaker
+from src.nlp.phonetic import MIN_PHONETIC_KEY_LENGTH, phonetic_key
+
 from .es_client import es, INDEX_NAME
 
 FUZINESS_SETTINGS = {6: 2, 5: 1, 4: 0}  # length of the word : fuzziness value
 
+# Original names plus their index-time transliterations
+NAME_SEARCH_FIELDS = [
+    "name",
+    "nameUk",
+    "nameEn",
+    "nameTranslit",
+    "nameCyrillic",
+]
+PHONETIC_BOOST = 0.5
+
+SEARCH_SETTINGS = {
+    "size": 10,  # hits requested per search value
+    "min_score": 1.0,  # weak hits are dropped inside Elasticsearch
+    "top_k": 5,  # businesses returned after fusion
+    "rrf_k": 60,  # reciprocal rank fusion constant
+    # One hit per brandId instead of every branch, if the index has brandId
+    "collapse_brands": True,
+    "max_branches": 10,  # branches returned per brand when expanded
+    # Latency controls: the whole search, retries included, must finish
+    # within the deadline, well inside the 5 s budget of the LLM calls
+    "deadline": 2.0,  # seconds
+    "shard_timeout_ratio": 0.8,  # share of the remaining time given to ES
+    "request_cache": True,  # reuse shard-level results of repeated queries
+    "retry_backoff": 0.05,  # seconds, doubled on every retry
+    "min_attempt_time": 0.2,  # seconds left to be worth another attempt
+}
+
+# Statuses of transient failures that are retried within the deadline
+RETRY_STATUSES = {429, 502, 503, 504}
 
-def calculate_fuzziness(text: str) -> int:
+# In-process cache of fused results. It is dropped when the catalogue
+# generation of the live index changes (a sync or an alias swap in another
+# process), checked at most every generation_check_interval seconds
+SEARCH_CACHE_SETTINGS = {
+    "max_size": 1024,
+    "ttl": 300,  # seconds
+    "generation_check_interval": 15,  # seconds
+}
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+_catalogue_generation = None
+_generation_checked_at = float("-inf")
+
+# Whether the live index maps brandId, checked once per process
+_brand_field_mapped = None
+
+
+def calculate_fuzziness(
+    text: str, fuzziness_settings: dict = FUZINESS_SETTINGS
+) -> int:
     """Calculate fuzziness based on text length using FUZINESS_SETTINGS."""
     text_length = len(text)
 
     # Find the appropriate fuzziness value based on text length
-    for min_length in sorted(FUZINESS_SETTINGS.keys(), reverse=True):
+    for min_length in sorted(fuzziness_settings.keys(), reverse=True):
         if text_length >= min_length:
-            return FUZINESS_SETTINGS[min_length]
+            return fuzziness_settings[min_length]
 
     return 0
 
 
-def search_business(text: str):
-    """Search for businesses in the index."""
-    fuzziness = calculate_fuzziness(text)
+def build_search_body(
+    text: str, fuzziness_settings: dict = FUZINESS_SETTINGS
+) -> dict:
+    """Build the business search query across all name variants."""
+    fuzziness = calculate_fuzziness(text, fuzziness_settings)
 
-    search_body = {
+    should = [
+        {
+            "multi_match": {  # n-gram / partial match
+                "query": text,
+                "fields": NAME_SEARCH_FIELDS,
+                "operator": "or",
+            }
+        },
+        {
+            "multi_match": {  # exact / short-word match
+                "query": text,
+                "type": "phrase",
+                "fields": [f"{field}.full" for field in NAME_SEARCH_FIELDS],
+            }
+        },
+        {
+            "multi_match": {  # fuzzy match on keyword fields
+                "query": text,
+                "fields": [f"{field}.keyword" for field in NAME_SEARCH_FIELDS],
+                "fuzziness": fuzziness,
+            }
+        },
+    ]
+
+    key = phonetic_key(text)
+    if len(key) >= MIN_PHONETIC_KEY_LENGTH:
+        should.append(
+            {  # same pronunciation regardless of script
+                "term": {
+                    "namePhonetic": {"value": key, "boost": PHONETIC_BOOST}
+                }
+            }
+        )
+
+    return {
         "query": {
             "bool": {
-                "should": [
-                    {
-                        "match": {  # n-gram / partial match
-                            "name": {"query": text, "operator": "or"}
-                        }
-                    },
-                    {
-                        "match_phrase": {  # exact / short-word match
-                            "name.full": {
-                                "query": text,
-                            }
-                        }
-                    },
-                    {
-                        "match": {  # fuzzy match on keyword field
-                            "name.keyword": {
-                                "query": text,
-                                "fuzziness": fuzziness,
-                            }
-                        }
-                    },
-                ],
+                "should": should,
                 "minimum_should_match": 1,
             }
         }
     }
-    response = es.search(index=INDEX_NAME, body=search_body)
-    return response
-
-
-def search_businesses(input_set: set):
-    """Search for businesses using multiple search terms and return unique matches."""
-    matches = []
-    for match in input_set:
-        response = search_business(match)
-        if response["hits"]["total"]["value"] > 0:
-            for hit in response["hits"]["hits"]:
-                match_data = {
-                    "id": hit["_source"]["id"],
-                    "name": hit["_source"]["name"],
+
+
+def _get_cached_search(key):
+    """Return a copy of cached matches if they have not expired."""
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, matches = entry
+        if time.monotonic() - stored_at > SEARCH_CACHE_SETTINGS["ttl"]:
+            del _search_cache[key]
+            return None
+        _search_cache.move_to_end(key)
+        return [dict(match) for match in matches]
+
+
+def _set_cached_search(key, matches):
+    """Cache fused matches, evicting the least recently used entries."""
+    with _search_cache_lock:
+        _search_cache[key] = (
+            time.monotonic(),
+            [dict(match) for match in matches],
+        )
+        while len(_search_cache) > SEARCH_CACHE_SETTINGS["max_size"]:
+            _search_cache.popitem(last=False)
+
+
+def _search_header(value: str) -> dict:
+    """Route repeated values to the same shard copies to reuse caches."""
+    return {
+        "index": INDEX_NAME,
+        "request_cache": SEARCH_SETTINGS["request_cache"],
+        # Preference strings must not start with "_"
+        "preference": f"q{zlib.crc32(value.encode('utf-8'))}",
+    }
+
+
+def _is_partial(response: dict) -> bool:
+    """Check if a search timed out or missed some shards."""
+    return bool(
+        response.get("timed_out") or response.get("_shards", {}).get("failed")
+    )
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Check if a search error is transient."""
+    if isinstance(error, (ConnectionError, ConnectionTimeout)):
+        return True
+    return isinstance(error, ApiError) and error.status_code in RETRY_STATUSES
+
+
+# Slow searches count as failures well before they reach the deadline
+es_breaker = CircuitBreaker(
+    "elasticsearch",
+    settings={
+        **BREAKER_SETTINGS,
+        "slow_call_seconds": SEARCH_SETTINGS["deadline"] * 0.75,
+    },
+    is_failure=_is_retryable,
+)
+# Waits for a slot block the calling thread; searches from async code run
+# on the default executor (see get_business_json_data)
+search_bulkhead = Bulkhead("search")
+# The warm-up searches cold caches at start. Its slow calls must not open
+# the breaker of requests, nor take their bulkhead slots
+warmup_breaker = CircuitBreaker(
+    "elasticsearch_warmup", is_failure=_is_retryable
+)
+
+
+def _msearch_with_retries(searches: list, deadline: float) -> dict:
+    """Run a multi search, retrying transient errors until the deadline."""
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        shard_timeout = remaining * SEARCH_SETTINGS["shard_timeout_ratio"]
+        for body in searches[1::2]:
+            body["timeout"] = f"{max(int(shard_timeout * 1000), 1)}ms"
+        try:
+            return es.options(request_timeout=max(remaining, 0.01)).msearch(
+                searches=searches
+            )
+        except Exception as e:
+            backoff = SEARCH_SETTINGS["retry_backoff"] * 2**attempt
+            time_left = deadline - time.monotonic() - backoff
+            if (
+                not _is_retryable(e)
+                or time_left < SEARCH_SETTINGS["min_attempt_time"]
+            ):
+                metrics.increment("business_search.failures")
+                raise
+            attempt += 1
+            metrics.increment("business_search.retries")
+            logger.warning(f"Retrying business search after error: {e}")
+            time.sleep(backoff)
+
+
+_msearch_within_deadline = search_bulkhead(es_breaker(_msearch_with_retries))
+_msearch_for_warmup = warmup_breaker(_msearch_with_retries)
+
+
+def fuse_ranked_hits(
+    ranked_hits: list,
+    top_k: int = SEARCH_SETTINGS["top_k"],
+    rrf_k: int = SEARCH_SETTINGS["rrf_k"],
+) -> list:
+    """Fuse per-value hit lists with reciprocal rank fusion.
+
+    Every match keeps its best Elasticsearch score as "score" and gets the
+    fused rank score as "rrfScore". Branches expanded by the search are
+    kept as "branches".
+    """
+    fused = {}
+    for hits in ranked_hits:
+        for rank, hit in enumerate(hits, 1):
+            source = hit["_source"]
+            # Different values may surface different branches of one brand
+            match = fused.setdefault(
+                source.get("brandId", source["id"]),
+                {
+                    "id": source["id"],
+                    "name": source["name"],
                     "score": hit["_score"],
-                }
-                # Avoid duplicates based on id
-                if not any(m["id"] == match_data["id"] for m in matches):
-                    matches.append(match_data)
+                    "rrfScore": 0.0,
+                },
+            )
+            match["score"] = max(match["score"], hit["_score"])
+            match["rrfScore"] += 1.0 / (rrf_k + rank)
+            branches = hit.get("inner_hits", {}).get("branches")
+            if branches and "branches" not in match:
+                match["branches"] = [
+                    branch["_source"] for branch in branches["hits"]["hits"]
+                ]
+
+    # Best possible fused score: ranked first for every search value
+    best_score = len(ranked_hits) / (rrf_k + 1)
+    matches = sorted(fused.values(), key=lambda m: m["rrfScore"], reverse=True)
+    matches = matches[:top_k]
+    for match in matches:
+        match["confidence"] = round(match["rrfScore"] / best_score, 4)
+    return matches
+
+
+@es_breaker
+def _get_brand_mapping() -> dict:
+    """Return the brandId mapping of every index behind the alias."""
+    return es.options(request_timeout=1).indices.get_field_mapping(
+        index=INDEX_NAME, fields="brandId"
+    )
+
+
+def _should_collapse_brands() -> bool:
+    """Check if hits can be collapsed by brandId in the live index.
+
+    Collapsing on an unmapped field fails every search, so indexes built
+    before brandId existed are searched per branch until rebuilt.
+    """
+    global _brand_field_mapped
+    if not SEARCH_SETTINGS["collapse_brands"]:
+        return False
+    if _brand_field_mapped is None:
+        try:
+            mappings = _get_brand_mapping()
+        except Exception as e:
+            logger.warning(f"Could not check the brandId mapping: {e}")
+            return False
+        _brand_field_mapped = bool(mappings) and all(
+            index_mapping["mappings"] for index_mapping in mappings.values()
+        )
+        if not _brand_field_mapped:
+            logger.warning(
+                f"Index '{INDEX_NAME}' has no brandId, branches are not "
+                "collapsed until it is rebuilt with rebuild_index.py"
+            )
+    return _brand_field_mapped
+
+
+@es_breaker
+def _get_catalogue_generation() -> tuple:
+    """Return the indexes behind the alias with their catalogue generation."""
+    mappings = es.options(request_timeout=1).indices.get_mapping(
+        index=INDEX_NAME
+    )
+    return tuple(
+        sorted(
+            (index, mapping["mappings"].get("_meta", {}).get("generation", 0))
+            for index, mapping in mappings.items()
+        )
+    )
+
+
+def _check_catalogue_generation():
+    """Drop cached results if the catalogue changed in another process."""
+    global _catalogue_generation, _generation_checked_at, _brand_field_mapped
+    now = time.monotonic()
+    with _search_cache_lock:
+        if (
+            now - _generation_checked_at
+            < SEARCH_CACHE_SETTINGS["generation_check_interval"]
+        ):
+            return
+        _generation_checked_at = now
+
+    try:
+        generation = _get_catalogue_generation()
+    except Exception as e:
+        # Cached results still expire after the TTL
+        logger.warning(f"Could not check the catalogue generation: {e}")
+        return
+    with _search_cache_lock:
+        if generation == _catalogue_generation:
+            return
+        _catalogue_generation = generation
+        _search_cache.clear()
+        # A rebuilt index may have gained brandId
+        _brand_field_mapped = None
+    logger.info(f"Catalogue generation changed: {generation}")
+
+
+def _search_value_hits(
+    values: list,
+    size: int = SEARCH_SETTINGS["size"],
+    min_score: float = SEARCH_SETTINGS["min_score"],
+    warmup: bool = False,
+    deadline: float = None,
+    expand_branches: bool = False,
+):
+    """Search businesses for every value in one request.
+
+    Returns the hits of each value that did not fail, and the values
+    whose search failed or is partial. The search ends by the request
+    deadline, a time.monotonic() value, if that comes first. Warm-up
+    searches bypass the breaker and bulkhead of requests.
+    """
+    started = time.monotonic()
+    search_deadline = started + SEARCH_SETTINGS["deadline"]
+    if deadline is not None:
+        search_deadline = min(search_deadline, deadline)
+    # A search doomed to time out would count against the breaker
+    if search_deadline - started < SEARCH_SETTINGS["min_attempt_time"]:
+        logger.warning("No time left to search businesses in the request")
+        metrics.increment("business_search.skipped")
+        return {}, set(values)
+
+    collapse = None
+    if _should_collapse_brands():
+        collapse = {"field": "brandId"}
+        if expand_branches:
+            collapse["inner_hits"] = {
+                "name": "branches",
+                "size": SEARCH_SETTINGS["max_branches"],
+                "_source": ["id", "name"],
+            }
+    searches = []
+    for value in values:
+        body = {
+            **build_search_body(value),
+            "size": size,
+            "min_score": min_score,
+            "_source": ["id", "name", "brandId"],
+        }
+        if collapse:
+            body["collapse"] = collapse
+        searches.append(_search_header(value))
+        searches.append(body)
+    msearch = _msearch_for_warmup if warmup else _msearch_within_deadline
+    response = msearch(searches, search_deadline)
+
+    value_hits = {}
+    partial = set()
+    for value, value_response in zip(values, response["responses"]):
+        if "error" in value_response:
+            logger.error(
+                f"Error searching businesses by '{value}': "
+                f"{value_response['error']}"
+            )
+            partial.add(value)
+            continue
+        if _is_partial(value_response):
+            logger.warning(f"Partial business results for '{value}'")
+            partial.add(value)
+        value_hits[value] = value_response["hits"]["hits"]
+
+    metrics.increment("business_search.requests")
+    metrics.observe(
+        "business_search.latency_ms", (time.monotonic() - started) * 1000
+    )
+    if partial:
+        metrics.increment("business_search.partial")
+    return value_hits, partial
+
+
+def prefetch_value_hits(
+    input_set: set,
+    size: int = SEARCH_SETTINGS["size"],
+    min_score: float = SEARCH_SETTINGS["min_score"],
+    deadline: float = None,
+    expand_branches: bool = False,
+) -> dict:
+    """Search some values ahead of the others, for search_businesses.
+
+    Only complete hits are returned, so partial ones are searched again.
+    """
+    values = sorted(value for value in input_set if value)
+    if not values:
+        return {}
+    value_hits, partial = _search_value_hits(
+        values,
+        size,
+        min_score,
+        deadline=deadline,
+        expand_branches=expand_branches,
+    )
+    return {
+        value: hits
+        for value, hits in value_hits.items()
+        if value not in partial
+    }
+
+
+def search_businesses(
+    input_set: set,
+    top_k: int = SEARCH_SETTINGS["top_k"],
+    size: int = SEARCH_SETTINGS["size"],
+    min_score: float = SEARCH_SETTINGS["min_score"],
+    known_hits: dict = None,
+    warmup: bool = False,
+    deadline: float = None,
+    expand_branches: bool = False,
+):
+    """Search businesses for every term in one request and fuse the ranks.
+
+    Branches of a brand are collapsed into its best hit; expand_branches
+    adds them to every match as "branches" when the index maps brandId.
+    Values in known_hits, from prefetch_value_hits with the same options,
+    are not searched again. deadline is the time.monotonic() by which the request
+    needs the result. Set warmup for searches made by the warm-up.
+    """
+    values = sorted(value for value in input_set if value)
+    if not values:
+        return []
+
+    _check_catalogue_generation()
+    cache_key = (tuple(values), top_k, size, min_score, expand_branches)
+    cached = _get_cached_search(cache_key)
+    if cached is not None:
+        metrics.increment("business_search.cache_hits")
+        return cached
+
+    value_hits = {
+        value: known_hits[value]
+        for value in values
+        if known_hits and value in known_hits
+    }
+    missing = [value for value in values if value not in value_hits]
+    partial = set()
+    if missing:
+        searched_hits, partial = _search_value_hits(
+            missing, size, min_score, warmup, deadline, expand_branches
+        )
+        value_hits.update(searched_hits)
 
+    matches = fuse_ranked_hits(
+        [value_hits[value] for value in values if value in value_hits],
+        top_k=top_k,
+    )
+    # Partial results are not cached so they are retried next time
+    if not partial:
+        _set_cached_search(cache_key, matches)
     return matches
@@ -5,7 +5,27 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from logging_config import logger
 
-from elastic.es_client import es, INDEX_NAME
+from elastic.es_client import indexing_es, INDEX_NAME, INDEX_VERSION_PREFIX
+
+NAME_FIELD_MAPPING = {
+    "type": "text",
+    "analyzer": "ngram_analyzer",  # partial/autocomplete
+    "search_analyzer": "ngram_analyzer",  # match n-grams properly
+    "fields": {
+        "keyword": {  # exact match, case- & accent-insensitive
+            "type": "keyword",
+            "normalizer": "lowercase_normalizer",
+        },
+        "full": {  # short/full match, case- & accent-insensitive
+            "type": "text",
+            "analyzer": "lowercase_analyzer",
+        },
+        "fuzzy": {  # fuzzy search, case- & accent-insensitive
+            "type": "text",
+            "analyzer": "lowercase_analyzer",
+        },
+    },
+}
 
 INDEX_CONFIG = {
     "settings": {
@@ -46,36 +66,96 @@ INDEX_CONFIG = {
     },
     "mappings": {
         "properties": {
-            "name": {
-                "type": "text",
-                "analyzer": "ngram_analyzer",  # partial/autocomplete
-                "search_analyzer": "ngram_analyzer",  # match n-grams properly
-                "fields": {
-                    "keyword": {  # exact match, case- & accent-insensitive
-                        "type": "keyword",
-                        "normalizer": "lowercase_normalizer",
-                    },
-                    "full": {  # short/full match, case- & accent-insensitive
-                        "type": "text",
-                        "analyzer": "lowercase_analyzer",
-                    },
-                    "fuzzy": {  # fuzzy search, case- & accent-insensitive
-                        "type": "text",
-                        "analyzer": "lowercase_analyzer",
-                    },
-                },
-            }
+            "name": NAME_FIELD_MAPPING,
+            "nameUk": NAME_FIELD_MAPPING,
+            "nameEn": NAME_FIELD_MAPPING,
+            # index-time transliterations (see elastic/business_enrichment.py)
+            "nameTranslit": NAME_FIELD_MAPPING,  # Cyrillic names in Latin
+            "nameCyrillic": NAME_FIELD_MAPPING,  # Latin names in Cyrillic
+            "namePhonetic": {"type": "keyword"},  # script-agnostic sound key
+            "brandId": {"type": "keyword"},  # branches share it, collapsed
+            "updatedAt": {"type": "date"},  # incremental sync watermark
         }
     },
 }
 
 
+def get_index_versions() -> list:
+    """Return the versions of existing physical business indexes."""
+    indices = indexing_es.indices.get(index=f"{INDEX_VERSION_PREFIX}*")
+    return sorted(
+        int(index[len(INDEX_VERSION_PREFIX) :])
+        for index in indices
+        if index[len(INDEX_VERSION_PREFIX) :].isdigit()
+    )
+
+
+def get_alias_indices() -> list:
+    """Return the physical indexes currently behind the read alias."""
+    if not indexing_es.indices.exists_alias(name=INDEX_NAME):
+        return []
+    return list(indexing_es.indices.get_alias(name=INDEX_NAME))
+
+
+def create_index_version(version: int) -> str:
+    """Create a physical index for the given version."""
+    index = f"{INDEX_VERSION_PREFIX}{version}"
+    indexing_es.indices.create(index=index, body=INDEX_CONFIG)
+    logger.info(f"Index '{index}' created successfully")
+    return index
+
+
+def swap_alias(index: str) -> None:
+    """Atomically point the read alias at the given physical index."""
+    actions = [
+        {"remove": {"index": old_index, "alias": INDEX_NAME}}
+        for old_index in get_alias_indices()
+        if old_index != index
+    ]
+    indices = indexing_es.indices
+    if indices.exists(index=INDEX_NAME) and not indices.exists_alias(
+        name=INDEX_NAME
+    ):
+        # Unversioned index from before aliases, replaced in the same step
+        actions.append({"remove_index": {"index": INDEX_NAME}})
+    actions.append(
+        {"add": {"index": index, "alias": INDEX_NAME, "is_write_index": True}}
+    )
+    indices.update_aliases(actions=actions)
+    logger.info(f"Alias '{INDEX_NAME}' now points to '{index}'")
+
+
+def bump_catalogue_generation() -> None:
+    """Tell searching processes that the catalogue behind the alias changed.
+
+    The generation is kept in the index metadata; business search drops
+    its cached results when it sees a new one.
+    """
+    for index in get_alias_indices():
+        mapping = indexing_es.indices.get_mapping(index=index)[index]
+        meta = mapping["mappings"].get("_meta", {})
+        indexing_es.indices.put_mapping(
+            index=index,
+            meta={**meta, "generation": meta.get("generation", 0) + 1},
+        )
+
+
+def prune_index_versions(keep: int) -> None:
+    """Delete all but the newest keep versions, never the live one."""
+    live_indices = set(get_alias_indices())
+    versions = get_index_versions()
+    for version in versions[: max(len(versions) - keep, 0)]:
+        index = f"{INDEX_VERSION_PREFIX}{version}"
+        if index not in live_indices:
+            indexing_es.indices.delete(index=index)
+            logger.info(f"Index '{index}' deleted")
+
+
 if __name__ == "__main__":
     try:
-        # Check if index already exists
-        if not es.indices.exists(index=INDEX_NAME):
-            es.indices.create(index=INDEX_NAME, body=INDEX_CONFIG)
-            logger.info(f"Index '{INDEX_NAME}' created successfully")
+        # Check if index or alias already exists
+        if not indexing_es.indices.exists(index=INDEX_NAME):
+            swap_alias(create_index_version(1))
         else:
             logger.info(f"Index '{INDEX_NAME}' already exists")
     except Exception as e:
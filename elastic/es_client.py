@@ -4,18 +4,31 @@ import os
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
 
+from resilience import BULKHEAD_SETTINGS
+
 load_dotenv()
 
 ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://elasticsearch:9200")
+# Alias of the live index version; physical indexes are businesses_v{n}
 INDEX_NAME = "businesses"
+INDEX_VERSION_PREFIX = f"{INDEX_NAME}_v"
 
 
-# Create Elasticsearch client with explicit connection settings
+# Create Elasticsearch client with explicit connection settings. Defaults
+# suit the request path: business search sets tighter per-call timeouts and
+# retries within its own deadline (see SEARCH_SETTINGS)
 es = Elasticsearch(
     [ELASTICSEARCH_URL],
-    request_timeout=30,
-    max_retries=3,
-    retry_on_timeout=True,
+    request_timeout=5,
+    max_retries=0,
+    retry_on_timeout=False,
     sniff_on_start=False,
     sniff_on_connection_fail=False,
+    # Enough pooled connections for every search the bulkhead admits
+    connections_per_node=BULKHEAD_SETTINGS["search"]["limit"],
+)
+
+# Bulk loads, force merges and other maintenance calls may run for long
+indexing_es = es.options(
+    request_timeout=60, max_retries=3, retry_on_timeout=True
 )
@@ -0,0 +1,46 @@
+import threading
+from collections import defaultdict, deque
+
+MAX_OBSERVATIONS = 1000  # latest values kept per metric for percentiles
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_observations = defaultdict(lambda: deque(maxlen=MAX_OBSERVATIONS))
+
+
+def increment(name, value=1):
+    """Add to a counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, value):
+    """Record a value, e.g. a latency in milliseconds."""
+    with _lock:
+        _observations[name].append(value)
+
+
+def _percentile(values, percent):
+    """Return the nearest-rank percentile of sorted values."""
+    index = max(round(percent / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def snapshot():
+    """Return the counters and percentiles of the recent observations."""
+    with _lock:
+        counters = dict(_counters)
+        observations = {name: sorted(v) for name, v in _observations.items()}
+    return {
+        "counters": counters,
+        "observations": {
+            name: {
+                "count": len(values),
+                "p50": _percentile(values, 50),
+                "p99": _percentile(values, 99),
+                "max": values[-1],
+            }
+            for name, values in observations.items()
+            if values
+        },
+    }
@@ -0,0 +1,318 @@
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+
+import metrics
+from logging_config import logger
+
+BREAKER_SETTINGS = {
+    "window": 20,  # latest calls used to compute the failure rate
+    "min_calls": 5,  # calls in the window before the breaker may open
+    "failure_rate": 0.5,  # share of failed or slow calls that opens it
+    "slow_call_seconds": 4.0,  # successful calls slower than this count
+    "open_seconds": 30.0,  # fail fast for this long, then probe
+    "half_open_calls": 1,  # concurrent probes allowed while half-open
+}
+
+# Concurrent calls per pipeline stage, and the longest wait for a slot
+BULKHEAD_SETTINGS = {
+    "asr": {"limit": 8, "max_wait": 2.0},
+    "chat": {"limit": 32, "max_wait": 2.0},
+    "user_data": {"limit": 16, "max_wait": 1.0},
+    "search": {"limit": 16, "max_wait": 0.5},
+}
+BULKHEAD_POLL_SECONDS = (0.002, 0.05)  # first and longest async poll delay
+
+# Load shedding of voice requests against a target latency
+ADMISSION_SETTINGS = {
+    "target_latency": 8.0,  # seconds, the latency objective of a request
+    "capacity": 8,  # requests served in parallel at the usual latency
+    "reject_ratio": 1.5,  # reject above this share of the target
+    "max_in_flight": 64,  # hard limit regardless of the estimate
+    "ewma_alpha": 0.2,  # weight of the newest latency in the average
+    "initial_latency": 4.0,  # seconds, used until requests complete
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+FULL, LITE = "full", "lite"
+
+
+class RejectedError(Exception):
+    """Raised when a dependency call is refused without being made."""
+
+    def __init__(self, message, name, retry_after):
+        super().__init__(message)
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RejectedError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open", name, retry_after)
+
+
+class OverloadedError(RejectedError):
+    """Raised when a request would miss the latency target by far."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many requests", "admission", retry_after)
+
+
+class BulkheadFullError(RejectedError):
+    """Raised when a stage has no free slot within its maximum wait."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Bulkhead '{name}' is full", name, retry_after)
+
+
+class CircuitBreaker:
+    """Fail fast on a dependency with a high error rate or latency."""
+
+    def __init__(
+        self,
+        name,
+        settings=BREAKER_SETTINGS,
+        is_failure=lambda error: True,
+    ):
+        self.name = name
+        self.settings = settings
+        self.is_failure = is_failure
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=settings["window"])  # True if failed
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def _set_state(self, state):
+        """Switch state; the caller holds the lock."""
+        if state == self._state:
+            return
+        logger.warning(f"Circuit '{self.name}': {self._state} -> {state}")
+        metrics.increment(f"circuit.{self.name}.{state}")
+        self._state = state
+        self._outcomes.clear()
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+
+    def before_call(self):
+        """Reserve a call, or raise CircuitOpenError while open."""
+        with self._lock:
+            if self._state == OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.settings["open_seconds"]:
+                    metrics.increment(f"circuit.{self.name}.rejected")
+                    raise CircuitOpenError(
+                        self.name, self.settings["open_seconds"] - elapsed
+                    )
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= self.settings["half_open_calls"]:
+                    metrics.increment(f"circuit.{self.name}.rejected")
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes += 1
+
+    def record(self, failed):
+        """Record the outcome of a call reserved with before_call."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._set_state(OPEN if failed else CLOSED)
+                return
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.settings["min_calls"] and (
+                sum(self._outcomes) / len(self._outcomes)
+                >= self.settings["failure_rate"]
+            ):
+                self._set_state(OPEN)
+
+    def release(self):
+        """Give back a reserved call that ended without an outcome."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def __call__(self, func):
+        """Decorate a sync or async function with this breaker."""
+        slow = self.settings["slow_call_seconds"]
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                self.before_call()
+                started = time.monotonic()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    # Errors of the caller (e.g. a bad request) do not count
+                    self.record(self.is_failure(e))
+                    raise
+                except BaseException:
+                    self.release()  # cancelled
+                    raise
+                self.record(time.monotonic() - started > slow)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.before_call()
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                # Errors of the caller (e.g. a bad request) do not count
+                self.record(self.is_failure(e))
+                raise
+            except BaseException:
+                self.release()  # interrupted
+                raise
+            self.record(time.monotonic() - started > slow)
+            return result
+
+        return wrapper
+
+
+class Bulkhead:
+    """Limit concurrent calls of one pipeline stage across all requests.
+
+    Every request runs its own event loop, so slots are a thread-safe
+    semaphore that coroutines poll instead of an asyncio.Semaphore.
+    """
+
+    def __init__(self, name, settings=None):
+        self.name = name
+        self.settings = settings or BULKHEAD_SETTINGS[name]
+        self._semaphore = threading.BoundedSemaphore(self.settings["limit"])
+
+    def _acquired(self, started):
+        """Record the queue wait of an acquired slot."""
+        metrics.observe(
+            f"bulkhead.{self.name}.wait_ms",
+            (time.monotonic() - started) * 1000,
+        )
+
+    def _rejected(self):
+        """Count a rejected call and build its error."""
+        metrics.increment(f"bulkhead.{self.name}.rejected")
+        return BulkheadFullError(self.name, self.settings["max_wait"])
+
+    def acquire(self):
+        """Take a slot, blocking up to max_wait."""
+        started = time.monotonic()
+        if not self._semaphore.acquire(timeout=self.settings["max_wait"]):
+            raise self._rejected()
+        self._acquired(started)
+
+    async def acquire_async(self):
+        """Take a slot without blocking the event loop."""
+        started = time.monotonic()
+        delay, max_delay = BULKHEAD_POLL_SECONDS
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() - started >= self.settings["max_wait"]:
+                raise self._rejected()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+        self._acquired(started)
+
+    def release(self):
+        """Free a slot taken with acquire or acquire_async."""
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def __call__(self, func):
+        """Decorate a sync or async function with this bulkhead."""
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                await self.acquire_async()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.release()
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.acquire()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.release()
+
+        return wrapper
+
+
+class AdmissionController:
+    """Admit, downgrade or reject requests by their estimated latency.
+
+    The estimate scales the average latency of full requests by how far
+    the requests in flight exceed the capacity. Over the target a request
+    runs in the cheaper lite mode, far over it the request is rejected.
+    """
+
+    def __init__(self, settings=ADMISSION_SETTINGS):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latency = settings["initial_latency"]
+
+    def estimate_latency(self, in_flight, slots=1):
+        """Estimate the latency of a request joining in_flight others."""
+        load = max((in_flight + slots) / self.settings["capacity"], 1.0)
+        return self._latency * load
+
+    def admit(self, slots=1):
+        """Return the mode of a new request or raise OverloadedError.
+
+        A request doing the work of several, e.g. a batch of recordings,
+        takes a slot for each.
+        """
+        with self._lock:
+            estimate = self.estimate_latency(self._in_flight, slots)
+            target = self.settings["target_latency"]
+            if (
+                self._in_flight + slots > self.settings["max_in_flight"]
+                or estimate > target * self.settings["reject_ratio"]
+            ):
+                metrics.increment("admission.rejected")
+                raise OverloadedError(retry_after=estimate - target)
+            self._in_flight += slots
+            mode = LITE if estimate > target else FULL
+        metrics.increment(f"admission.{mode}")
+        return mode
+
+    def finish(self, mode, latency=None, slots=1):
+        """Release an admitted request and learn from its latency.
+
+        Requests that did not run the pipeline, e.g. invalid ones, or
+        that are not comparable to a single request, e.g. batches, are
+        released without a latency so they do not skew the average.
+        """
+        with self._lock:
+            self._in_flight -= slots
+            # Lite requests are cheaper and would hide the real load
+            if mode == FULL and latency is not None:
+                alpha = self.settings["ewma_alpha"]
+                self._latency = alpha * latency + (1 - alpha) * self._latency
+        if latency is not None:
+            metrics.observe(f"admission.{mode}.latency_ms", latency * 1000)
@@ -0,0 +1,159 @@
+import struct
+
+AUDIO_SETTINGS = {
+    "max_size": 25 * 1024 * 1024,  # bytes, the Whisper upload limit
+    "max_duration": 300,  # seconds of audio in one recording
+    "header_size": 64,  # bytes read to sniff the container
+}
+
+# Containers the ASR backend accepts as is: format -> (extension, mimetype)
+AUDIO_FORMATS = {
+    "mp3": ("mp3", "audio/mpeg"),
+    "ogg": ("ogg", "audio/ogg"),  # Opus or Vorbis
+    "wav": ("wav", "audio/wav"),
+    "m4a": ("m4a", "audio/mp4"),  # AAC in an MP4 container
+    "flac": ("flac", "audio/flac"),
+    "webm": ("webm", "audio/webm"),
+}
+
+# Sample rates by MPEG version bits: 3 is MPEG-1, 2 MPEG-2, 0 MPEG-2.5
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+def sniff_audio_format(header):
+    """Detect the audio container from the first bytes of a file."""
+    if header.startswith(b"ID3"):
+        return "mp3"
+    if header.startswith(b"OggS"):
+        return "ogg"
+    if header.startswith(b"RIFF") and header[8:12] == b"WAVE":
+        return "wav"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    if header.startswith(b"fLaC"):
+        return "flac"
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    # MPEG audio frame sync; layer bits 00 are raw AAC (ADTS) instead
+    if len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        if header[1] & 0x06:
+            return "mp3"
+        return "aac"
+    return None
+
+
+def _mp3_duration(file, size):
+    """Read MP3 duration from the frame count of its Xing or VBRI header.
+
+    Variable bitrate files cannot be timed from one frame, so files
+    without either header are not estimated.
+    """
+    file.seek(0)
+    header = file.read(10)
+    offset = 0
+    if header.startswith(b"ID3") and len(header) == 10:
+        # Tag size is a 28-bit syncsafe integer
+        offset = 10 + sum(
+            (byte & 0x7F) << (7 * (3 - i)) for i, byte in enumerate(header[6:])
+        )
+    file.seek(offset)
+    frame = file.read(64)
+    # Only Layer III (layer bits 01) carries Xing and VBRI headers
+    if (
+        len(frame) < 64
+        or frame[0] != 0xFF
+        or frame[1] & 0xE0 != 0xE0
+        or frame[1] & 0x06 != 0x02
+    ):
+        return None
+    version = (frame[1] >> 3) & 0x03
+    rate_index = (frame[2] >> 2) & 0x03
+    if version not in _MP3_SAMPLE_RATES or rate_index == 3:
+        return None
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 3 else 576
+
+    # Xing (or Info for CBR) follows the side information of the frame
+    mono = frame[3] >> 6 == 3
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing = 4 + side_info
+    frames = None
+    if frame[xing : xing + 4] in (b"Xing", b"Info"):
+        (flags,) = struct.unpack(">I", frame[xing + 4 : xing + 8])
+        if flags & 0x01:
+            (frames,) = struct.unpack(">I", frame[xing + 8 : xing + 12])
+    elif frame[36:40] == b"VBRI":
+        (frames,) = struct.unpack(">I", frame[50:54])
+    if not frames:
+        return None
+    return frames * samples_per_frame / sample_rate
+
+
+def _wav_duration(file, size):
+    """Calculate WAV duration from the byte rate in its header."""
+    file.seek(28)
+    byte_rate = file.read(4)
+    if len(byte_rate) < 4:
+        return None
+    (byte_rate,) = struct.unpack("<I", byte_rate)
+    return (size - 44) / byte_rate if byte_rate else None
+
+
+def estimate_duration(file, audio_format, size):
+    """Estimate the duration in seconds, or None if it is not known."""
+    estimators = {"mp3": _mp3_duration, "wav": _wav_duration}
+    if audio_format not in estimators:
+        return None
+    try:
+        return estimators[audio_format](file, size)
+    finally:
+        file.seek(0)
+
+
+def inspect_upload(file):
+    """Sniff and check an uploaded recording.
+
+    Returns the format of the recording and None, or None and the reason
+    it was rejected.
+    """
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(0)
+    if size == 0:
+        return None, "Uploaded file is empty"
+    if size > AUDIO_SETTINGS["max_size"]:
+        return None, (
+            f"File is larger than {AUDIO_SETTINGS['max_size'] // 2**20} MB"
+        )
+
+    header = file.read(AUDIO_SETTINGS["header_size"])
+    file.seek(0)
+    audio_format = sniff_audio_format(header)
+    if audio_format not in AUDIO_FORMATS:
+        return None, (
+            "Unsupported audio format, allowed: " + ", ".join(AUDIO_FORMATS)
+        )
+
+    duration = estimate_duration(file, audio_format, size)
+    if duration is not None and duration > AUDIO_SETTINGS["max_duration"]:
+        return None, (
+            f"Recording is longer than {AUDIO_SETTINGS['max_duration']} s"
+        )
+    return audio_format, None
+
+
+def asr_file(file):
+    """Return the (filename, file, mimetype) of a recording for upload."""
+    if isinstance(file, bytes):
+        header = file[: AUDIO_SETTINGS["header_size"]]
+    else:
+        header = file.read(AUDIO_SETTINGS["header_size"])
+        file.seek(0)
+    extension, mimetype = AUDIO_FORMATS.get(
+        sniff_audio_format(header), AUDIO_FORMATS["mp3"]
+    )
+    return f"audio.{extension}", file, mimetype
@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 import httpx
 
 from logging_config import logger
+from resilience import Bulkhead
 
 # Fake user data for demo purposes - to be removed in production
 from _helpers.api_demo_data.categories import DEMO_CATEGORIES
@@ -18,13 +19,15 @@ ENDPOINT_URL = os.getenv("ENDPOINT_URL")
 
 HEADERS = {"accept": "*/*", "Authorization": f"Bearer {ENDPOINT_BEARER_TOKEN}"}
 
+user_data_bulkhead = Bulkhead("user_data")
+
 
 async def get_user_data(id, user_data_type):
     """Fetch user data from the API endpoint."""
     url = f"{ENDPOINT_URL}users/{id}/{user_data_type}"
 
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
+        async with user_data_bulkhead, httpx.AsyncClient(timeout=15) as client:
             response = await client.get(url, headers=HEADERS)
 
             if response.status_code == 200:
@@ -1,5 +1,11 @@
+import json
+
 import httpx
 
+from resilience import Bulkhead, CircuitBreaker
+
+from .audio import asr_file
+
 CHAT_SETTINGS = {
     "audio_model": "whisper-1",
     "text_model": "gpt-4o-mini",
@@ -7,6 +13,23 @@ CHAT_SETTINGS = {
 }
 
 
+def is_openai_failure(error):
+    """Check if an error means OpenAI itself is failing."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+audio_breaker = CircuitBreaker("openai_audio", is_failure=is_openai_failure)
+chat_breaker = CircuitBreaker("openai_chat", is_failure=is_openai_failure)
+# Slots are taken before the breaker so waiting for one is not a failure
+asr_bulkhead = Bulkhead("asr")
+chat_bulkhead = Bulkhead("chat")
+
+
+@asr_bulkhead
+@audio_breaker
 async def transcript_audio_file(api_key, file):
     """Transcribe an audio file using the OpenAI API."""
     url = "https://api.openai.com/v1/audio/transcriptions"
@@ -15,7 +38,8 @@ async def transcript_audio_file(api_key, file):
     }
 
     files = {
-        "file": ("audio_file", file, "audio/mp3"),
+        # The real container, so Whisper decodes it without transcoding
+        "file": asr_file(file),
     }
 
     data = {
@@ -33,8 +57,26 @@ async def transcript_audio_file(api_key, file):
     return response.text
 
 
-async def process_text(api_key, system_prompt, user_prompt, model=None):
-    """Process text using the chat model."""
+@chat_bulkhead
+@chat_breaker
+async def complete_chat(
+    api_key,
+    system_prompt,
+    user_prompt,
+    model=None,
+    response_format=None,
+    extra_messages=(),
+    on_delta=None,
+    logprobs=False,
+):
+    """Run a chat completion.
+
+    response_format constrains the output, e.g. to a JSON schema, and
+    extra_messages follow the user prompt, e.g. to re-ask a question.
+    With on_delta the completion is streamed and every piece of content
+    is passed to it as it arrives. Returns the content, model, token usage
+    and, if requested, the log probability of every output token.
+    """
     url = "https://api.openai.com/v1/chat/completions"
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -47,12 +89,82 @@ async def process_text(api_key, system_prompt, user_prompt, model=None):
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
+            *extra_messages,
         ],
         "temperature": 0,
     }
+    if response_format is not None:
+        payload["response_format"] = response_format
+    if logprobs:
+        payload["logprobs"] = True
+    if on_delta is not None:
+        return await _stream_completion(url, headers, payload, on_delta)
 
     async with httpx.AsyncClient(timeout=5.0) as async_client:
         response = await async_client.post(url, json=payload, headers=headers)
         response.raise_for_status()  # Raise exception for 4xx/5xx responses
 
-    return response.json()["choices"][0]["message"]["content"]
+    body = response.json()
+    choice = body["choices"][0]
+    return {
+        "content": choice["message"]["content"],
+        "model": model,
+        "usage": body.get("usage") or {},
+        "logprobs": _token_logprobs(choice),
+    }
+
+
+def _token_logprobs(choice):
+    """Return the log probabilities of the tokens of a choice or delta."""
+    return [
+        token["logprob"]
+        for token in (choice.get("logprobs") or {}).get("content") or ()
+    ]
+
+
+async def _stream_completion(url, headers, payload, on_delta):
+    """Stream a chat completion and return it like complete_chat."""
+    content = []
+    logprobs = []
+    usage = {}
+    payload = {
+        **payload,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    async with httpx.AsyncClient(timeout=5.0) as async_client:
+        async with async_client.stream(
+            "POST", url, json=payload, headers=headers
+        ) as response:
+            response.raise_for_status()
+            # Server-sent events: "data: <chunk>" lines, then "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: ") :]
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # The last chunk has no choices, only the usage
+                usage = chunk.get("usage") or usage
+                if not chunk["choices"]:
+                    continue
+                logprobs += _token_logprobs(chunk["choices"][0])
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    content.append(delta)
+                    on_delta(delta)
+    return {
+        "content": "".join(content),
+        "model": payload["model"],
+        "usage": usage,
+        "logprobs": logprobs,
+    }
+
+
+async def process_text(api_key, system_prompt, user_prompt, **options):
+    """Process text using the chat model and return the content."""
+    completion = await complete_chat(
+        api_key, system_prompt, user_prompt, **options
+    )
+    return completion["content"]
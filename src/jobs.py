@@ -0,0 +1,315 @@
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+import httpx
+
+from logging_config import logger
+from resilience import RejectedError
+
+load_dotenv()
+
+JOBS_DB = os.getenv("JOBS_DB", "jobs.sqlite3")
+
+JOB_SETTINGS = {
+    "workers": int(os.getenv("JOB_WORKERS", 2)),  # jobs processed at once
+    "poll_interval": 0.5,  # seconds between polls of an empty queue
+    "max_attempts": 3,  # attempts of a job rejected by a dependency
+    "stale_after": 300,  # seconds before a running job is requeued
+    "retention": 24 * 3600,  # seconds finished jobs are kept
+    "callback_timeout": 10,  # seconds
+    # Hosts callbacks may be sent to; any public host if empty
+    "callback_hosts": frozenset(
+        filter(None, os.getenv("JOB_CALLBACK_HOSTS", "").split(","))
+    ),
+}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_lock = threading.Lock()
+_workers = []
+
+
+_CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    user_id INTEGER,
+    audio BLOB,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+
+@contextmanager
+def _connect():
+    """Open the job store in a transaction, creating the table."""
+    connection = sqlite3.connect(JOBS_DB, timeout=10)
+    try:
+        with connection:
+            connection.execute(_CREATE_TABLE_SQL)
+            yield connection
+    finally:
+        connection.close()
+
+
+def create_job(audio, user_id=None, callback_url=None):
+    """Queue an uploaded recording and return the job id."""
+    job_id = uuid.uuid4().hex
+    now = datetime.now().isoformat()
+    with _connect() as connection:
+        connection.execute(
+            "INSERT INTO jobs (id, status, user_id, audio, callback_url, "
+            "available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_id,
+                QUEUED,
+                user_id,
+                audio,
+                callback_url,
+                time.time(),
+                now,
+                now,
+            ),
+        )
+    return job_id
+
+
+def get_job(job_id):
+    """Return the status and result of a job, or None if unknown."""
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT id, status, result, error, created_at, updated_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    job_id, status, result, error, created_at, updated_at = row
+    return {
+        "jobId": job_id,
+        "status": status,
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "createdAt": created_at,
+        "updatedAt": updated_at,
+    }
+
+
+def _claim_job():
+    """Mark the oldest available job as running and return it."""
+    now = time.time()
+    with _connect() as connection:
+        # Jobs of a worker that died while running them are picked up
+        # again, until they run out of attempts
+        return connection.execute(
+            "UPDATE jobs SET status = ?, started_at = ?, "
+            "attempts = attempts + 1, updated_at = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE (status = ? "
+            "AND available_at <= ?) OR (status = ? AND started_at < ? "
+            "AND attempts < ?) ORDER BY created_at LIMIT 1) "
+            "RETURNING id, user_id, audio, callback_url, attempts",
+            (
+                RUNNING,
+                now,
+                datetime.now().isoformat(),
+                QUEUED,
+                now,
+                RUNNING,
+                now - JOB_SETTINGS["stale_after"],
+                JOB_SETTINGS["max_attempts"],
+            ),
+        ).fetchone()
+
+
+def _fail_stale_jobs():
+    """Fail running jobs that went stale on their last attempt.
+
+    Returns the ids and callback URLs of the failed jobs.
+    """
+    with _connect() as connection:
+        return connection.execute(
+            "UPDATE jobs SET status = ?, error = ?, audio = NULL, "
+            "updated_at = ? WHERE status = ? AND started_at < ? "
+            "AND attempts >= ? RETURNING id, callback_url",
+            (
+                FAILED,
+                "Job did not finish in time",
+                datetime.now().isoformat(),
+                RUNNING,
+                time.time() - JOB_SETTINGS["stale_after"],
+                JOB_SETTINGS["max_attempts"],
+            ),
+        ).fetchall()
+
+
+def _requeue_job(job_id, error, retry_after):
+    """Make a job available again after retry_after seconds."""
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, available_at = ?, error = ?, "
+            "updated_at = ? WHERE id = ?",
+            (
+                QUEUED,
+                time.time() + retry_after,
+                error,
+                datetime.now().isoformat(),
+                job_id,
+            ),
+        )
+
+
+def _finish_job(job_id, status, result=None, error=None):
+    """Store the outcome of a job."""
+    with _connect() as connection:
+        # The recording is not needed once the job has an outcome
+        connection.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, audio = NULL, "
+            "updated_at = ? WHERE id = ?",
+            (
+                status,
+                (
+                    json.dumps(result, ensure_ascii=False, default=str)
+                    if result is not None
+                    else None
+                ),
+                error,
+                datetime.now().isoformat(),
+                job_id,
+            ),
+        )
+
+
+def _purge_jobs():
+    """Delete finished jobs older than the retention period."""
+    cutoff = datetime.fromtimestamp(
+        time.time() - JOB_SETTINGS["retention"]
+    ).isoformat()
+    with _connect() as connection:
+        connection.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (DONE, FAILED, cutoff),
+        )
+
+
+def get_callback_url_error(callback_url):
+    """Return why a callback URL is not allowed, or None if it is.
+
+    Callbacks go over https to the configured hosts or, without a host
+    list, to hosts resolving only to public addresses.
+    """
+    try:
+        url = urlsplit(callback_url)
+        host, port = url.hostname, url.port
+    except ValueError:
+        return "callbackUrl is not a valid URL"
+    if url.scheme != "https" or not host:
+        return "callbackUrl must be an https URL"
+    if JOB_SETTINGS["callback_hosts"]:
+        if host not in JOB_SETTINGS["callback_hosts"]:
+            return "callbackUrl host is not allowed"
+        return None
+
+    try:
+        addresses = {
+            info[4][0].split("%")[0]
+            for info in socket.getaddrinfo(host, port or 443)
+        }
+    except OSError:
+        return "callbackUrl host cannot be resolved"
+    for address in map(ipaddress.ip_address, addresses):
+        if not address.is_global or address.is_multicast:
+            return "callbackUrl host is not a public address"
+    return None
+
+
+def _send_callback(job_id, callback_url):
+    """Post the finished job to the client's callback URL."""
+    # Checked again, the host may resolve elsewhere since the job started
+    error = get_callback_url_error(callback_url)
+    if error:
+        logger.error(f"Callback of job {job_id} skipped: {error}")
+        return
+    try:
+        response = httpx.post(
+            callback_url,
+            json=get_job(job_id),
+            timeout=JOB_SETTINGS["callback_timeout"],
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Callback of job {job_id} to {callback_url} failed: {e}")
+
+
+def _run_job(process, job):
+    """Process one claimed job and store its outcome."""
+    job_id, user_id, audio, callback_url, attempts = job
+    try:
+        result = process(audio, user_id)
+    except RejectedError as e:
+        if attempts < JOB_SETTINGS["max_attempts"]:
+            logger.warning(f"Job {job_id} requeued: {e}")
+            _requeue_job(job_id, str(e), e.retry_after)
+            return
+        logger.error(f"Job {job_id} failed: {e}")
+        _finish_job(job_id, FAILED, error=str(e))
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        _finish_job(job_id, FAILED, error=str(e))
+    else:
+        _finish_job(job_id, DONE, result=result)
+
+    if callback_url:
+        _send_callback(job_id, callback_url)
+
+
+def _work(process):
+    """Process queued jobs until the worker exits."""
+    while True:
+        try:
+            for job_id, callback_url in _fail_stale_jobs():
+                logger.error(f"Job {job_id} failed: ran out of attempts")
+                if callback_url:
+                    _send_callback(job_id, callback_url)
+            job = _claim_job()
+            if job is None:
+                _purge_jobs()
+                time.sleep(JOB_SETTINGS["poll_interval"])
+                continue
+            _run_job(process, job)
+        except Exception as e:
+            logger.error(f"Job worker error: {e}", exc_info=True)
+            time.sleep(JOB_SETTINGS["poll_interval"])
+
+
+def start_job_workers(process, workers=JOB_SETTINGS["workers"]):
+    """Start background threads running process(audio, user_id) for jobs."""
+    with _lock:
+        if _workers:
+            return
+        for number in range(workers):
+            worker = threading.Thread(
+                target=_work,
+                args=(process,),
+                name=f"job-{number}",
+                daemon=True,
+            )
+            worker.start()
+            _workers.append(worker)
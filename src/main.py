@@ -1,172 +1,846 @@
 import os
 import asyncio
 import json
+import queue
+import threading
+import time
+from difflib import SequenceMatcher
 
 from dotenv import load_dotenv
 import functions_framework
-from flask import jsonify, make_response
+import httpx
+from flask import Response, jsonify, make_response
 from datetime import datetime
 
-from .prompts import (
-    MAIN_PROMPT,
-    BUSINESS_PROMPT,
-    make_categories_prompt,
-    make_labels_prompt,
-    make_accounts_prompt,
-    make_datetime,
+from .prompt_registry import (
+    choose_version,
+    choose_versions,
+    record_variant,
+    render_prompt,
 )
-from .gpt import transcript_audio_file, process_text
+from .gpt import transcript_audio_file, complete_chat
 from .endpoints import get_user_categories, get_user_labels, get_user_accounts
 from .validation import validate_and_merge_json, validate_response
+from .routing import is_confident, plan_route, record_route
+from .schemas import (
+    SCHEMA_SETTINGS,
+    IncrementalJSONParser,
+    SchemaError,
+    parse_response,
+    response_format,
+)
+from .merchant_history import record_confirmed_business
+from .nlp.text_normalization import clean_special_characters
+from .audio import AUDIO_SETTINGS, inspect_upload
+from .warmup import readiness, start_warmup
+from .jobs import (
+    create_job,
+    get_callback_url_error,
+    get_job,
+    start_job_workers,
+)
 from .postprocessing import (
     process_time_llm_response,
     process_business_llm_response,
 )
+import metrics
+from elastic.business_search import prefetch_value_hits
 from logging_config import logger
+from resilience import (
+    ADMISSION_SETTINGS,
+    FULL,
+    LITE,
+    AdmissionController,
+    OverloadedError,
+    RejectedError,
+)
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+admission = AdmissionController()
 
-async def get_main_json_data(OPENAI_API_KEY, transcription_text):
-    """Fetch the main JSON response based on transcription."""
-    llm_response = await process_text(
-        OPENAI_API_KEY,
-        system_prompt=MAIN_PROMPT,
-        user_prompt=transcription_text,
-    )
-    return llm_response
+# Validated form fields resolved by each extractor
+EXTRACTOR_FIELDS = {
+    "main": ("amount", "currency", "description"),
+    "categories": ("categoryId",),
+    "labels": ("labelsId",),
+    "accounts": ("accountId",),
+    "datetime": ("datetime",),
+    "business": ("businesses", "businessId"),
+}
+
+# Business keys searched as soon as the model has generated them
+EARLY_SEARCH_KEYS = ("business", "uk_lemma")
 
+# Accept headers that switch the voice endpoint to a streamed response
+STREAM_MIMETYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
 
-async def get_categories_json_data(
-    OPENAI_API_KEY, transcription_text, user_id
+TEXT_SETTINGS = {
+    "max_length": 2000,  # characters of an on-device transcript
+    "min_similarity": 0.85,  # below this the server transcript is used
+}
+
+BATCH_SETTINGS = {
+    "max_files": 20,  # recordings accepted in one batch
+    "transcription_concurrency": 4,  # recordings transcribed at once
+}
+
+
+async def process_json_or_default(
+    api_key, extractor, system_prompt, user_prompt, on_key=None, version=None
 ):
-    """Fetch the categories JSON response."""
-    modified_categories, api_categories = await get_user_categories(user_id)
-    system_prompt = make_categories_prompt(modified_categories)
-    llm_response = await process_text(
-        OPENAI_API_KEY,
-        system_prompt=system_prompt,
-        user_prompt=transcription_text,
+    """Extract the JSON of one extractor, or {} for validation defaults.
+
+    The cheapest model routed for the input answers first. An answer not
+    matching the extractor schema, or with low confidence, is escalated to
+    the next model; the strongest one is re-asked with its answer and the
+    error. With on_key the answer is streamed and on_key(key, value)
+    called as each top-level key completes. Answers are recorded for the
+    prompt version, if given.
+    """
+    models = plan_route(extractor, user_prompt)
+    models += (models[-1],) * (
+        SCHEMA_SETTINGS["max_retries"] + 1 - len(models)
     )
-    return llm_response, api_categories
+    extra_messages = ()
+    for index, model in enumerate(models):
+        started = time.monotonic()
+        try:
+            completion = await complete_chat(
+                api_key,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                model=model,
+                response_format=response_format(extractor),
+                extra_messages=extra_messages,
+                on_delta=(
+                    IncrementalJSONParser(on_key).feed if on_key else None
+                ),
+                logprobs=True,
+            )
+        except (RejectedError, httpx.HTTPError) as e:
+            logger.error(f"Text processing failed, using defaults: {e!r}")
+            return {}
+        latency = time.monotonic() - started
+        if version is not None:
+            record_variant(extractor, version, completion, latency)
+        content = completion["content"]
+        is_last = index == len(models) - 1
+
+        try:
+            data = parse_response(extractor, content)
+        except SchemaError as e:
+            record_route(extractor, completion, latency, failed=True)
+            metrics.increment(f"schema.{extractor}.invalid")
+            logger.warning(f"Invalid {extractor} response ({e}): {content}")
+            extra_messages = ()
+            if not is_last and models[index + 1] == model:
+                extra_messages = (
+                    {"role": "assistant", "content": content},
+                    {
+                        "role": "user",
+                        "content": f"Відповідь не відповідає схемі: {e}. "
+                        "Поверни ВИКЛЮЧНО JSON у визначеному форматі.",
+                    },
+                )
+            continue
+
+        confident = is_confident(extractor, completion)
+        record_route(extractor, completion, latency, failed=not confident)
+        # The strongest model's answer is kept even if it is not confident
+        if confident or model == models[-1]:
+            return data
+        metrics.increment(f"route.{extractor}.escalations")
+        extra_messages = ()
+    return {}
 
 
-async def get_labels_json_data(OPENAI_API_KEY, transcription_text, user_id):
-    """Fetch the labels JSON response."""
-    api_labels = await get_user_labels(id=user_id)
-    system_prompt = make_labels_prompt(api_labels)
-    llm_response = await process_text(
+async def get_main_json_data(OPENAI_API_KEY, transcription_text, version=None):
+    """Fetch the main JSON response based on transcription."""
+    version = version or choose_version("main")
+    llm_response = await process_json_or_default(
         OPENAI_API_KEY,
-        system_prompt=system_prompt,
+        "main",
+        system_prompt=render_prompt("main", version),
         user_prompt=transcription_text,
+        version=version,
     )
-    return llm_response, api_labels
+    return llm_response
 
 
-async def get_accounts_json_data(OPENAI_API_KEY, transcription_text, user_id):
-    """Fetch the accounts JSON response."""
-    api_accounts = await get_user_accounts(id=user_id)
-    system_prompt = make_accounts_prompt(api_accounts)
-    llm_response = await process_text(
+async def get_user_json_data(
+    OPENAI_API_KEY, transcription_text, system_prompt, extractor, version=None
+):
+    """Fetch the JSON response of a prompt rendered from user data."""
+    llm_response = await process_json_or_default(
         OPENAI_API_KEY,
+        extractor,
         system_prompt=system_prompt,
         user_prompt=transcription_text,
+        version=version,
     )
-    return llm_response, api_accounts
+    return llm_response
 
 
 async def get_datetime_json_data(
-    OPENAI_API_KEY, transcription_text, current_time=datetime.now().isoformat()
+    OPENAI_API_KEY,
+    transcription_text,
+    current_time=datetime.now().isoformat(),
+    version=None,
 ):
     """Fetch the datetime JSON response."""
-    system_prompt = make_datetime(current_time)
-    llm_response = await process_text(
+    version = version or choose_version("datetime")
+    llm_response = await process_json_or_default(
         OPENAI_API_KEY,
-        system_prompt=system_prompt,
+        "datetime",
+        system_prompt=render_prompt("datetime", version, current_time),
         user_prompt=transcription_text,
+        version=version,
     )
     return process_time_llm_response(llm_response, current_time)
 
 
-async def get_business_json_data(OPENAI_API_KEY, transcription_text):
-    """Fetch the business JSON response."""
-    llm_response = await process_text(
+async def get_business_json_data(
+    OPENAI_API_KEY,
+    transcription_text,
+    user_id=None,
+    version=None,
+    deadline=None,
+):
+    """Fetch the business JSON response.
+
+    The answer is streamed, and the business is searched by its name and
+    lemma while the model still generates the other keys. Searches end by
+    the request deadline, a time.monotonic() value.
+    """
+    loop = asyncio.get_running_loop()
+    prefetches = {}
+
+    def on_key(key, value):
+        if (
+            key in EARLY_SEARCH_KEYS
+            and isinstance(value, str)
+            and value
+            and value not in prefetches
+        ):
+            prefetches[value] = loop.run_in_executor(
+                None,
+                lambda: prefetch_value_hits({value}, deadline=deadline),
+            )
+
+    version = version or choose_version("business")
+    llm_response = await process_json_or_default(
         OPENAI_API_KEY,
-        system_prompt=BUSINESS_PROMPT,
+        "business",
+        system_prompt=render_prompt("business", version),
         user_prompt=transcription_text,
+        on_key=on_key,
+        version=version,
+    )
+
+    known_hits = {}
+    for prefetched in await asyncio.gather(
+        *prefetches.values(), return_exceptions=True
+    ):
+        if isinstance(prefetched, Exception):
+            logger.error(f"Early business search failed: {prefetched!r}")
+        else:
+            known_hits.update(prefetched)
+    return await loop.run_in_executor(
+        None,
+        process_business_llm_response,
+        llm_response,
+        user_id,
+        known_hits,
+        deadline,
     )
-    return process_business_llm_response(llm_response)
 
 
-async def parse_audio_into_json(audio_file, user_id=19):
-    """Handle audio processing and run JSON generation tasks asynchronously."""
-    transcription_text = await transcript_audio_file(
-        OPENAI_API_KEY, file=audio_file
+async def skip_business_json_data():
+    """Leave the business empty, used when shedding load."""
+    return {"business_id": None}
+
+
+async def load_user_context(user_id):
+    """Fetch user data and render the prompts built from it once.
+
+    Prompt versions are picked per user, so a user keeps seeing the same
+    variant of every prompt.
+    """
+    (modified_categories, categories), labels, accounts = await asyncio.gather(
+        get_user_categories(user_id),
+        get_user_labels(id=user_id),
+        get_user_accounts(id=user_id),
     )
-    logger.info(f"### Processed audio:\n {transcription_text}")
+    versions = choose_versions(user_id)
+    return {
+        "categories": categories,
+        "labels": labels,
+        "accounts": accounts,
+        "versions": versions,
+        "prompts": {
+            "categories": render_prompt(
+                "categories", versions["categories"], modified_categories
+            ),
+            "labels": render_prompt("labels", versions["labels"], labels),
+            "accounts": render_prompt(
+                "accounts", versions["accounts"], accounts
+            ),
+        },
+    }
+
+
+async def _named(name, coroutine):
+    """Await a coroutine and return its result along with a name."""
+    return name, await coroutine
+
+
+async def extract_form(
+    transcription_text,
+    context,
+    user_id=None,
+    lite=False,
+    on_fields=None,
+    deadline=None,
+):
+    """Run JSON generation tasks on a transcription and validate the form.
+
+    In lite mode the business is not extracted or searched. on_fields is
+    called with the validated fields of every extractor as it completes.
+    The business search ends by deadline, a time.monotonic() value.
+    """
+    prompts = context["prompts"]
+    versions = context["versions"]
+    user_data = (context["categories"], context["labels"], context["accounts"])
+
+    extractors = {
+        "main": get_main_json_data(
+            OPENAI_API_KEY, transcription_text, versions["main"]
+        ),
+        **{
+            name: get_user_json_data(
+                OPENAI_API_KEY,
+                transcription_text,
+                prompts[name],
+                name,
+                versions[name],
+            )
+            for name in ("categories", "labels", "accounts")
+        },
+        "datetime": get_datetime_json_data(
+            OPENAI_API_KEY,
+            transcription_text,
+            datetime.now().isoformat(),
+            versions["datetime"],
+        ),
+        "business": (
+            skip_business_json_data()
+            if lite
+            else get_business_json_data(
+                OPENAI_API_KEY,
+                transcription_text,
+                user_id,
+                versions["business"],
+                deadline,
+            )
+        ),
+    }
 
     # Run all text-processing tasks concurrently
-    (
-        main_json,
-        (categories_json, categories),
-        (labels_json, labels),
-        (accounts_json, accounts),
-        datetime_json,
-        business_json,
-    ) = await asyncio.gather(
-        get_main_json_data(OPENAI_API_KEY, transcription_text),
-        get_categories_json_data(OPENAI_API_KEY, transcription_text, user_id),
-        get_labels_json_data(OPENAI_API_KEY, transcription_text, user_id),
-        get_accounts_json_data(OPENAI_API_KEY, transcription_text, user_id),
-        get_datetime_json_data(OPENAI_API_KEY, transcription_text),
-        get_business_json_data(OPENAI_API_KEY, transcription_text),
-    )
-
-    logger.debug(f"### Main response:\n {main_json}")
-    logger.debug(f"### Categories response:\n {categories_json}")
-    logger.debug(f"### Labels response:\n {labels_json}")
-    logger.debug(f"### Accounts response:\n {accounts_json}")
-    logger.debug(f"### Datetime response:\n {datetime_json}")
-    logger.debug(f"### Business response:\n {business_json}")
+    responses = {}
+    for completed in asyncio.as_completed(
+        [_named(name, extractor) for name, extractor in extractors.items()]
+    ):
+        name, response = await completed
+        responses[name] = response
+        logger.debug(f"### {name.capitalize()} response:\n {response}")
+        if on_fields:
+            fields = validate_response(
+                validate_and_merge_json((response,)), *user_data
+            )
+            on_fields(
+                {field: fields[field] for field in EXTRACTOR_FIELDS[name]}
+            )
 
     # Merge the results
     merged_json = validate_and_merge_json(
-        (
-            main_json,
-            categories_json,
-            labels_json,
-            accounts_json,
-            datetime_json,
-            business_json,
-        )
+        tuple(responses[name] for name in extractors)
     )
 
     logger.debug(f"### Processed JSON:\n {merged_json}")
-    return validate_response(merged_json, categories, labels, accounts)
+    return validate_response(merged_json, *user_data)
 
 
-async def process_request(request):
-    """Process the request asynchronously."""
-    audio_file = request.files.get("file")
+async def parse_audio_into_json(
+    audio_file, user_id=None, lite=False, on_event=None
+):
+    """Handle audio processing and run JSON generation tasks asynchronously.
+
+    Without user_id the merchant history is not used. In lite mode the
+    business is not extracted or searched. on_event is called with
+    (event, data) for the transcript and each resolved field.
+    """
+    # Retries of the business search stop at the latency target of the
+    # request, not at a fixed time after the search started
+    deadline = time.monotonic() + ADMISSION_SETTINGS["target_latency"]
+    # User data does not depend on the transcription, fetch it meanwhile
+    transcription_text, context = await asyncio.gather(
+        transcript_audio_file(OPENAI_API_KEY, file=audio_file),
+        load_user_context(user_id),
+    )
+    logger.info(f"### Processed audio:\n {transcription_text}")
+    if on_event is None:
+        return await extract_form(
+            transcription_text, context, user_id, lite, deadline=deadline
+        )
+
+    on_event("transcript", {"text": transcription_text})
+    return await extract_form(
+        transcription_text,
+        context,
+        user_id,
+        lite,
+        on_fields=lambda fields: on_event("fields", fields),
+        deadline=deadline,
+    )
 
+
+def parse_user_id(user_id):
+    """Return an optional userId as an int, raising ValueError if invalid.
+
+    Form fields arrive as digit strings, JSON ids as integers; None means
+    an anonymous request.
+    """
+    if user_id is None:
+        return None
+    if isinstance(user_id, str) and user_id.isdigit():
+        return int(user_id)
+    # bool is an int subclass but not an id
+    if isinstance(user_id, int) and not isinstance(user_id, bool):
+        return user_id
+    raise ValueError("userId must be an integer")
+
+
+def get_form_user_id(request):
+    """Return the optional userId form field, raising ValueError if invalid."""
+    return parse_user_id(request.form.get("userId"))
+
+
+def get_upload_error(audio_file):
+    """Return an error response for a missing or unsupported upload."""
     if not audio_file:
         return jsonify({"error": "No file uploaded"}), 400
 
-    if not audio_file.filename.lower().endswith(".mp3"):
-        return jsonify({"error": "Invalid file format, only MP3 allowed"}), 400
+    # Checked on the spooled upload, before any call to OpenAI
+    _, error = inspect_upload(audio_file)
+    if error:
+        return jsonify({"error": error}), 400
+    return None
+
 
-    result = await parse_audio_into_json(audio_file)
+async def process_request(request, mode=FULL):
+    """Process the request asynchronously."""
+    audio_file = request.files.get("file")
+
+    upload_error = get_upload_error(audio_file)
+    if upload_error:
+        return upload_error
+    try:
+        user_id = get_form_user_id(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        result = await parse_audio_into_json(
+            audio_file, user_id, lite=mode == LITE
+        )
+    except RejectedError as e:
+        # Nothing to extract from without a transcription
+        response = jsonify({"error": "Transcription is unavailable"})
+        response.headers["Retry-After"] = str(max(int(e.retry_after), 1))
+        return response, 503
     logger.info(f"### Output JSON:\n {result}")
 
     # Use json.dumps with ensure_ascii=False to preserve Unicode characters
     response = make_response(json.dumps(result, ensure_ascii=False))
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    response.headers["X-Processing-Mode"] = mode
+    return response, 200
+
+
+def transcript_similarity(first, second):
+    """Compare two transcripts ignoring case and punctuation (0..1)."""
+    first = clean_special_characters(first.lower())
+    second = clean_special_characters(second.lower())
+    return SequenceMatcher(None, first, second).ratio()
+
+
+async def transcribe_for_verification(audio_file):
+    """Transcribe audio sent along a transcript, or None if unavailable."""
+    try:
+        return await transcript_audio_file(OPENAI_API_KEY, file=audio_file)
+    except (RejectedError, httpx.HTTPError) as e:
+        logger.error(f"Transcript verification skipped: {e!r}")
+        return None
+
+
+async def process_text_request(request, mode=FULL):
+    """Extract the form from an on-device transcript, skipping ASR.
+
+    Audio sent along is transcribed on the server meanwhile; if the
+    transcripts differ, the form is extracted from the server one.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        audio_file = None
+    else:
+        data = request.form.to_dict()
+        audio_file = request.files.get("file")
+
+    text = data.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({"error": "No text provided"}), 400
+    if len(text) > TEXT_SETTINGS["max_length"]:
+        return (
+            jsonify(
+                {
+                    "error": f"Text is longer than "
+                    f"{TEXT_SETTINGS['max_length']} characters"
+                }
+            ),
+            400,
+        )
+    try:
+        user_id = parse_user_id(data.get("userId"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if audio_file:
+        upload_error = get_upload_error(audio_file)
+        if upload_error:
+            return upload_error
+
+    lite = mode == LITE
+    context = await load_user_context(user_id)
+    transcript_source = "device"
+    if audio_file:
+        result, server_text = await asyncio.gather(
+            extract_form(text, context, user_id, lite),
+            transcribe_for_verification(audio_file),
+        )
+        if server_text is not None:
+            similarity = transcript_similarity(text, server_text)
+            logger.info(f"### Transcript similarity: {similarity:.2f}")
+            if similarity < TEXT_SETTINGS["min_similarity"]:
+                result = await extract_form(
+                    server_text, context, user_id, lite
+                )
+                transcript_source = "server"
+    else:
+        result = await extract_form(text, context, user_id, lite)
+    logger.info(f"### Output JSON:\n {result}")
+
+    response = make_response(json.dumps(result, ensure_ascii=False))
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    response.headers["X-Processing-Mode"] = mode
+    response.headers["X-Transcript-Source"] = transcript_source
     return response, 200
 
 
+def format_stream_event(event, data, stream_format):
+    """Serialize one event as a server-sent event or an NDJSON line."""
+    if stream_format == "ndjson":
+        payload = {"event": event, "data": data}
+        return json.dumps(payload, ensure_ascii=False, default=str) + "\n"
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def stream_request(request, mode, stream_format, on_done):
+    """Stream the transcript, each field as it resolves, then the form.
+
+    on_done(completed) is called once the stream ends, with whether the
+    form was produced.
+    """
+    audio_file = request.files.get("file")
+    upload_error = get_upload_error(audio_file)
+    if upload_error:
+        on_done(False)
+        return upload_error
+    try:
+        user_id = get_form_user_id(request)
+    except ValueError as e:
+        on_done(False)
+        return jsonify({"error": str(e)}), 400
+    # Read now, the request is gone by the time the pipeline runs
+    audio = audio_file.read()
+    events = queue.Queue()
+
+    def run():
+        completed = False
+        try:
+            result = asyncio.run(
+                parse_audio_into_json(
+                    audio,
+                    user_id,
+                    lite=mode == LITE,
+                    on_event=lambda event, data: events.put((event, data)),
+                )
+            )
+            logger.info(f"### Output JSON:\n {result}")
+            events.put(("form", result))
+            completed = True
+        except Exception as e:
+            logger.error(f"Error streaming form: {e}", exc_info=True)
+            events.put(("error", {"error": str(e)}))
+        finally:
+            events.put(None)
+            on_done(completed)
+
+    threading.Thread(target=run, name="stream", daemon=True).start()
+
+    def generate():
+        while (event := events.get()) is not None:
+            yield format_stream_event(*event, stream_format)
+
+    response = Response(generate(), mimetype=STREAM_MIMETYPES[stream_format])
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Processing-Mode"] = mode
+    return response, 200
+
+
+def process_confirmation(request):
+    """Record the business of a form confirmed by the user."""
+    data = request.get_json(silent=True) or {}
+    business_id = data.get("businessId")
+    business_name = data.get("businessName")
+
+    try:
+        user_id = parse_user_id(data.get("userId"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if (
+        user_id is None
+        or not isinstance(business_id, int)
+        or isinstance(business_id, bool)
+    ):
+        return jsonify({"error": "userId and businessId are required"}), 400
+    if not isinstance(business_name, str) or not business_name.strip():
+        return jsonify({"error": "businessName is required"}), 400
+
+    record_confirmed_business(user_id, business_id, business_name)
+    return jsonify({"status": "ok"}), 200
+
+
+async def process_batch(audio_files, user_id, lite=False):
+    """Process several recordings of one user with a shared context."""
+    context_task = asyncio.create_task(load_user_context(user_id))
+    transcription_slots = asyncio.Semaphore(
+        BATCH_SETTINGS["transcription_concurrency"]
+    )
+
+    async def process_file(audio_file):
+        async with transcription_slots:
+            transcription_text = await transcript_audio_file(
+                OPENAI_API_KEY, file=audio_file
+            )
+        logger.info(f"### Processed audio:\n {transcription_text}")
+        return await extract_form(
+            transcription_text, await context_task, user_id, lite
+        )
+
+    results = await asyncio.gather(
+        *(process_file(audio_file) for audio_file in audio_files),
+        return_exceptions=True,
+    )
+
+    files = []
+    for audio_file, result in zip(audio_files, results):
+        # Cancellation of the batch is not a failure of one file
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            logger.error(f"Error processing {audio_file.filename}: {result}")
+            files.append(
+                {"filename": audio_file.filename, "error": str(result)}
+            )
+        else:
+            files.append({"filename": audio_file.filename, "result": result})
+    return files
+
+
+async def process_batch_request(request, mode=FULL):
+    """Process a multipart request with several recordings of one user."""
+    audio_files = request.files.getlist("file")
+    if not audio_files:
+        return jsonify({"error": "No file uploaded"}), 400
+    if len(audio_files) > BATCH_SETTINGS["max_files"]:
+        return (
+            jsonify(
+                {
+                    "error": f"At most {BATCH_SETTINGS['max_files']} files "
+                    "are allowed per batch"
+                }
+            ),
+            400,
+        )
+    for audio_file in audio_files:
+        upload_error = get_upload_error(audio_file)
+        if upload_error:
+            return upload_error
+
+    try:
+        user_id = get_form_user_id(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    files = await process_batch(audio_files, user_id, lite=mode == LITE)
+
+    response = make_response(
+        json.dumps({"files": files}, ensure_ascii=False, default=str)
+    )
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    response.headers["X-Processing-Mode"] = mode
+    return response, 200
+
+
+def process_job(audio, user_id):
+    """Run the voice pipeline for a queued recording."""
+    return asyncio.run(parse_audio_into_json(audio, user_id))
+
+
+def submit_job(request):
+    """Queue an upload and return its job id without waiting."""
+    audio_file = request.files.get("file")
+    upload_error = get_upload_error(audio_file)
+    if upload_error:
+        return upload_error
+
+    try:
+        user_id = get_form_user_id(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    callback_url = request.form.get("callbackUrl")
+    if callback_url:
+        callback_url_error = get_callback_url_error(callback_url)
+        if callback_url_error:
+            return jsonify({"error": callback_url_error}), 400
+
+    job_id = create_job(
+        audio_file.read(),
+        user_id=user_id,
+        callback_url=callback_url,
+    )
+    response = jsonify({"jobId": job_id, "status": "queued"})
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return response, 202
+
+
+def get_job_status(job_id):
+    """Return the status, and the form once done, of a job."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = make_response(json.dumps(job, ensure_ascii=False))
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    return response, 200
+
+
+def get_max_request_size(request):
+    """Return the largest body accepted for the requested endpoint."""
+    max_files = (
+        BATCH_SETTINGS["max_files"]
+        if request.path.rstrip("/") == "/batch"
+        else 1
+    )
+    # Room for the other form fields
+    return AUDIO_SETTINGS["max_size"] * max_files + 64 * 1024
+
+
 @functions_framework.http
 def voice_to_form(request):
     """API Function to handle voice to form conversion."""
-    return asyncio.run(process_request(request))
+    # Warm connections and caches, and process queued jobs, once this
+    # process serves its first request, usually the readiness probe;
+    # importers stay side-effect free
+    start_warmup()
+    start_job_workers(process_job)
+    if request.path.rstrip("/") == "/readyz":
+        status = readiness()
+        return jsonify(status), 200 if status["ready"] else 503
+    if request.path.rstrip("/") == "/metrics":
+        return jsonify(metrics.snapshot()), 200
+    if request.path.rstrip("/") == "/confirm":
+        return process_confirmation(request)
+
+    # Reject oversized uploads before reading them; Flask also enforces
+    # the limit while parsing uploads sent without Content-Length
+    request.max_content_length = get_max_request_size(request)
+    if (request.content_length or 0) > request.max_content_length:
+        return jsonify({"error": "Request is too large"}), 413
+
+    if request.path.rstrip("/") == "/jobs" and request.method == "POST":
+        return submit_job(request)
+    if request.path.startswith("/jobs/") and request.method == "GET":
+        return get_job_status(request.path.rstrip("/").rsplit("/", 1)[-1])
+
+    # A batch takes an admission slot per recording it runs at once
+    slots = (
+        min(
+            max(len(request.files.getlist("file")), 1),
+            BATCH_SETTINGS["transcription_concurrency"],
+        )
+        if request.path.rstrip("/") == "/batch"
+        else 1
+    )
+    try:
+        mode = admission.admit(slots)
+    except OverloadedError as e:
+        response = jsonify({"error": "Too many requests, retry later"})
+        response.headers["Retry-After"] = str(max(int(e.retry_after), 1))
+        return response, 429
+
+    started = time.monotonic()
+
+    def finish(completed):
+        # Only forms served in full are a latency sample: fast failures
+        # (invalid input, open breakers, full bulkheads) would drag the
+        # estimate down, and a batch takes as long as several requests
+        is_batch = request.path.rstrip("/") == "/batch"
+        admission.finish(
+            mode,
+            (
+                time.monotonic() - started
+                if completed and not is_batch
+                else None
+            ),
+            slots,
+        )
+
+    stream_format = next(
+        (
+            stream_format
+            for stream_format, mimetype in STREAM_MIMETYPES.items()
+            if mimetype in request.headers.get("Accept", "")
+        ),
+        None,
+    )
+    if stream_format and request.path.rstrip("/") in ("", "/"):
+        return stream_request(request, mode, stream_format, on_done=finish)
+
+    response = None
+    try:
+        if request.path.rstrip("/") == "/batch":
+            response = asyncio.run(process_batch_request(request, mode))
+        elif request.path.rstrip("/") == "/text":
+            response = asyncio.run(process_text_request(request, mode))
+        else:
+            response = asyncio.run(process_request(request, mode))
+        return response
+    finally:
+        finish(response is not None and response[1] == 200)
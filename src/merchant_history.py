@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from elastic.business_rerank import best_business_match, rerank_businesses
+from logging_config import logger
+
+load_dotenv()
+
+MERCHANT_HISTORY_DB = os.getenv(
+    "MERCHANT_HISTORY_DB", "merchant_history.sqlite3"
+)
+
+HISTORY_SETTINGS = {
+    "max_merchants_per_user": 50,  # least used merchants are evicted
+    "max_cached_users": 10000,  # users kept in memory (LRU)
+    "match_probability": 0.8,  # resolve without global search above this
+}
+
+_lock = threading.Lock()
+_users = OrderedDict()  # user id -> {business id -> merchant}
+
+
+_CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS merchant_history (
+    user_id TEXT NOT NULL,
+    business_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_used_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, business_id)
+)
+"""
+
+
+@contextmanager
+def _connect():
+    """Open the history store in a transaction, creating the table."""
+    connection = sqlite3.connect(MERCHANT_HISTORY_DB)
+    try:
+        with connection:
+            connection.execute(_CREATE_TABLE_SQL)
+            yield connection
+    finally:
+        connection.close()
+
+
+def _load_user(user_id):
+    """Return the in-memory merchants of a user, loading them if needed."""
+    key = str(user_id)
+    if key in _users:
+        _users.move_to_end(key)
+        return _users[key]
+
+    with _connect() as connection:
+        rows = connection.execute(
+            "SELECT business_id, name, count, last_used_at "
+            "FROM merchant_history WHERE user_id = ?",
+            (key,),
+        ).fetchall()
+    _users[key] = {
+        business_id: {
+            "id": business_id,
+            "name": name,
+            "count": count,
+            "lastUsedAt": last_used_at,
+        }
+        for business_id, name, count, last_used_at in rows
+    }
+    while len(_users) > HISTORY_SETTINGS["max_cached_users"]:
+        _users.popitem(last=False)
+    return _users[key]
+
+
+def record_confirmed_business(user_id, business_id, name):
+    """Count a business confirmed by the user and persist it."""
+    now = datetime.now().isoformat()
+    with _lock:
+        merchants = _load_user(user_id)
+        merchant = merchants.setdefault(
+            business_id, {"id": business_id, "name": name, "count": 0}
+        )
+        merchant["name"] = name
+        merchant["count"] += 1
+        merchant["lastUsedAt"] = now
+
+        # Keep only the most used merchants of the user
+        overflow = len(merchants) - HISTORY_SETTINGS["max_merchants_per_user"]
+        evicted = sorted(
+            merchants.values(), key=lambda m: (m["count"], m["lastUsedAt"])
+        )[: max(overflow, 0)]
+        for stale in evicted:
+            del merchants[stale["id"]]
+
+        with _connect() as connection:
+            connection.execute(
+                "INSERT INTO merchant_history "
+                "(user_id, business_id, name, count, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, business_id) DO UPDATE SET "
+                "name = excluded.name, count = excluded.count, "
+                "last_used_at = excluded.last_used_at",
+                (str(user_id), business_id, name, merchant["count"], now),
+            )
+            connection.executemany(
+                "DELETE FROM merchant_history "
+                "WHERE user_id = ? AND business_id = ?",
+                [(str(user_id), stale["id"]) for stale in evicted],
+            )
+
+
+def get_frequency_priors(user_id):
+    """Return business id -> usage frequency relative to the top merchant."""
+    if user_id is None:
+        return {}
+    with _lock:
+        merchants = list(_load_user(user_id).values())
+    if not merchants:
+        return {}
+    top_count = max(merchant["count"] for merchant in merchants)
+    return {
+        merchant["id"]: merchant["count"] / top_count for merchant in merchants
+    }
+
+
+def match_user_merchant(user_id, query_values):
+    """Find a confident match for the extracted business in user history."""
+    if user_id is None:
+        return None
+    with _lock:
+        merchants = list(_load_user(user_id).values())
+    if not merchants:
+        return None
+
+    priors = get_frequency_priors(user_id)
+    candidates = [
+        {
+            "id": merchant["id"],
+            "name": merchant["name"],
+            "prior": priors[merchant["id"]],
+        }
+        for merchant in merchants
+    ]
+    best_match = best_business_match(
+        rerank_businesses(query_values, candidates)
+    )
+    if (
+        best_match
+        and best_match["probability"] >= HISTORY_SETTINGS["match_probability"]
+    ):
+        logger.debug(f"Business resolved from user history: {best_match}")
+        return best_match
+    return None
+
+
+def get_popular_merchants(limit):
+    """Return the names of businesses confirmed most often by all users."""
+    with _connect() as connection:
+        rows = connection.execute(
+            "SELECT name, SUM(count) AS total FROM merchant_history "
+            "GROUP BY business_id ORDER BY total DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [name for name, _ in rows]
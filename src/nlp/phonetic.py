@@ -0,0 +1,84 @@
+import re
+import unicodedata
+
+from .transliteration import has_cyrillic, transliterate_ukrainian_to_english
+
+PHONETIC_KEY_LENGTH = 8
+MIN_PHONETIC_KEY_LENGTH = 3
+
+# Latin spellings reduced to a single sound before coding
+_SOUND_REPLACEMENTS = (
+    ("shch", "s"),
+    ("sch", "s"),
+    ("sh", "s"),
+    ("zh", "z"),
+    ("kh", "h"),
+    ("ch", "c"),
+    ("ts", "c"),
+    ("tz", "c"),
+    ("ph", "f"),
+    ("th", "t"),
+    ("wh", "v"),
+    ("ck", "k"),
+    ("qu", "kv"),
+    ("gh", "g"),
+    ("x", "ks"),
+    ("w", "v"),
+    ("q", "k"),
+    ("j", "i"),
+    ("y", "i"),
+)
+
+# Soundex-style consonant classes
+_SOUND_CLASSES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgksz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+_VOWELS = set("aeiou")
+_NON_LETTERS_RE = re.compile(r"[^a-z]")
+
+
+def _to_plain_latin(text):
+    """Romanize text and keep only lowercase ASCII letters."""
+    if has_cyrillic(text):
+        text = transliterate_ukrainian_to_english(text)
+    text = unicodedata.normalize("NFKD", text.lower())
+    return _NON_LETTERS_RE.sub("", text)
+
+
+def phonetic_key(text):
+    """Build a Ukrainian-adapted Soundex key that ignores the script used."""
+    latin = _to_plain_latin(text or "")
+    for spelling, sound in _SOUND_REPLACEMENTS:
+        latin = latin.replace(spelling, sound)
+
+    key = []
+    previous = None
+    for position, letter in enumerate(latin):
+        code = _SOUND_CLASSES.get(letter)
+        if code is None:
+            if position == 0 and letter in _VOWELS:
+                key.append("0")
+            # "h" is silent and does not separate repeated consonants
+            if letter != "h":
+                previous = None
+            continue
+        if code != previous:
+            key.append(code)
+        previous = code
+    return "".join(key)[:PHONETIC_KEY_LENGTH]
+
+
+def phonetic_keys(text):
+    """Return phonetic keys of every leading word sequence of the text."""
+    words = (text or "").split()
+    keys = set()
+    for end in range(1, len(words) + 1):
+        key = phonetic_key(" ".join(words[:end]))
+        if len(key) >= MIN_PHONETIC_KEY_LENGTH:
+            keys.add(key)
+    return keys
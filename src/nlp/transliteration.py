@@ -1,6 +1,318 @@
-from transliterate import translit
+import re
+from functools import lru_cache
+
+TRANSLITERATION_CACHE_SIZE = 4096
+
+APOSTROPHES = "'’ʼ`"
+
+# Base letter tables per romanization scheme (lowercase Cyrillic -> Latin)
+_BASE_TABLES = {
+    # Official passport transliteration (Cabinet of Ministers resolution 55)
+    "kmu2010": {
+        "а": "a",
+        "б": "b",
+        "в": "v",
+        "г": "h",
+        "ґ": "g",
+        "д": "d",
+        "е": "e",
+        "є": "ie",
+        "ж": "zh",
+        "з": "z",
+        "и": "y",
+        "і": "i",
+        "ї": "i",
+        "й": "i",
+        "к": "k",
+        "л": "l",
+        "м": "m",
+        "н": "n",
+        "о": "o",
+        "п": "p",
+        "р": "r",
+        "с": "s",
+        "т": "t",
+        "у": "u",
+        "ф": "f",
+        "х": "kh",
+        "ц": "ts",
+        "ч": "ch",
+        "ш": "sh",
+        "щ": "shch",
+        "ь": "",
+        "ю": "iu",
+        "я": "ia",
+        "ё": "io",
+        "ы": "y",
+        "э": "e",
+        "ъ": "",
+    },
+    # Scholarly system, diacritics are folded by the index analyzers
+    "scholarly": {
+        "а": "a",
+        "б": "b",
+        "в": "v",
+        "г": "h",
+        "ґ": "g",
+        "д": "d",
+        "е": "e",
+        "є": "je",
+        "ж": "ž",
+        "з": "z",
+        "и": "y",
+        "і": "i",
+        "ї": "ji",
+        "й": "j",
+        "к": "k",
+        "л": "l",
+        "м": "m",
+        "н": "n",
+        "о": "o",
+        "п": "p",
+        "р": "r",
+        "с": "s",
+        "т": "t",
+        "у": "u",
+        "ф": "f",
+        "х": "x",
+        "ц": "c",
+        "ч": "č",
+        "ш": "š",
+        "щ": "šč",
+        "ь": "",
+        "ю": "ju",
+        "я": "ja",
+        "ё": "jo",
+        "ы": "y",
+        "э": "e",
+        "ъ": "",
+    },
+    # How an English speaker would spell the sound of the name
+    "phonetic_en": {
+        "а": "a",
+        "б": "b",
+        "в": "v",
+        "г": "h",
+        "ґ": "g",
+        "д": "d",
+        "е": "e",
+        "є": "ye",
+        "ж": "zh",
+        "з": "z",
+        "и": "i",
+        "і": "i",
+        "ї": "yi",
+        "й": "y",
+        "к": "k",
+        "л": "l",
+        "м": "m",
+        "н": "n",
+        "о": "o",
+        "п": "p",
+        "р": "r",
+        "с": "s",
+        "т": "t",
+        "у": "u",
+        "ф": "f",
+        "х": "h",
+        "ц": "ts",
+        "ч": "ch",
+        "ш": "sh",
+        "щ": "shch",
+        "ь": "",
+        "ю": "yu",
+        "я": "ya",
+        "ё": "yo",
+        "ы": "i",
+        "э": "e",
+        "ъ": "",
+    },
+}
+
+# Replacements for є/ї/й/ю/я at the beginning of a word
+_WORD_INITIAL_TABLES = {
+    "kmu2010": {"є": "ye", "ї": "yi", "й": "y", "ю": "yu", "я": "ya"},
+    "scholarly": {"є": "je", "ї": "ji", "й": "j", "ю": "ju", "я": "ja"},
+    "phonetic_en": {"є": "ye", "ї": "yi", "й": "y", "ю": "yu", "я": "ya"},
+}
+
+# Letter combinations with a dedicated spelling, applied before the table
+_DIGRAPHS = {
+    "kmu2010": {"зг": "zgh", "Зг": "Zgh", "ЗГ": "ZGH"},
+    "scholarly": {},
+    "phonetic_en": {"кс": "x", "Кс": "X", "КС": "X"},
+}
+
+TRANSLITERATION_SCHEMES = tuple(_BASE_TABLES)
+
+# Word start: not preceded by a letter, a digit or an apostrophe
+_WORD_INITIAL_RE = re.compile(
+    rf"(?<![\w{APOSTROPHES}])[єїйюяЄЇЙЮЯ]", flags=re.UNICODE
+)
+_CYRILLIC_RE = re.compile(r"[а-яёґєіїА-ЯЁҐЄІЇ]")
+_CAPITALS_RE = re.compile(r"[А-ЯЁҐЄІЇ]{2}")
+_WORD_RE = re.compile(rf"[\w{APOSTROPHES}]+", flags=re.UNICODE)
+
+
+def _make_translate_table(letters):
+    """Build a str.translate table with upper- and lowercase letters."""
+    table = {ord(apostrophe): None for apostrophe in APOSTROPHES}
+    for cyrillic, latin in letters.items():
+        table[ord(cyrillic)] = latin
+        table[ord(cyrillic.upper())] = latin.capitalize()
+    return table
+
+
+_TRANSLATE_TABLES = {
+    scheme: _make_translate_table(letters)
+    for scheme, letters in _BASE_TABLES.items()
+}
+
+
+def _apply_word_initial_rules(text, scheme):
+    """Replace є/ї/й/ю/я at word start with their word-initial spelling."""
+    initial_letters = _WORD_INITIAL_TABLES[scheme]
+
+    def replace(match):
+        letter = match.group(0)
+        latin = initial_letters[letter.lower()]
+        return latin if letter.islower() else latin.capitalize()
+
+    return _WORD_INITIAL_RE.sub(replace, text)
+
+
+def _transliterate_letters(text, scheme):
+    """Transliterate text letter by letter with a romanization scheme."""
+    for cyrillic, latin in _DIGRAPHS[scheme].items():
+        if cyrillic in text:
+            text = text.replace(cyrillic, latin)
+    return _apply_word_initial_rules(text, scheme).translate(
+        _TRANSLATE_TABLES[scheme]
+    )
+
+
+def _transliterate_scheme(text, scheme):
+    """Transliterate text with a single romanization scheme.
+
+    Words in capitals stay in capitals: "ЖИТО" is "ZHYTO", not "ZhYTO".
+    """
+    if not _CAPITALS_RE.search(text):
+        return _transliterate_letters(text, scheme)
+
+    def replace(match):
+        word = match.group(0)
+        latin = _transliterate_letters(word, scheme)
+        return latin.upper() if len(word) > 1 and word.isupper() else latin
+
+    return _WORD_RE.sub(replace, text)
+
+
+def has_cyrillic(text):
+    """Check whether text contains any Cyrillic letters."""
+    return bool(_CYRILLIC_RE.search(text or ""))
+
+
+@lru_cache(maxsize=TRANSLITERATION_CACHE_SIZE)
+def _transliterate_all(text):
+    """Transliterate text with every scheme, memoized per input string."""
+    return tuple(
+        _transliterate_scheme(text, scheme)
+        for scheme in TRANSLITERATION_SCHEMES
+    )
+
+
+def transliterate_variants(text):
+    """Return Latin variants of Ukrainian text keyed by romanization scheme."""
+    if not text:
+        return {scheme: "" for scheme in TRANSLITERATION_SCHEMES}
+    return dict(zip(TRANSLITERATION_SCHEMES, _transliterate_all(text)))
 
 
 def transliterate_ukrainian_to_english(text):
-    """Transliterate Ukrainian text to English using transliteration library."""
-    return translit(text, "uk", reversed=True).replace("'", "")
+    """Transliterate Ukrainian text to English using the KMU 2010 scheme."""
+    return transliterate_variants(text)["kmu2010"]
+
+
+# Latin letter combinations -> Cyrillic, matched longest first
+_LATIN_TO_CYRILLIC = {
+    "shch": "щ",
+    "sch": "щ",
+    "zh": "ж",
+    "kh": "х",
+    "ch": "ч",
+    "sh": "ш",
+    "ts": "ц",
+    "tz": "ц",
+    "ph": "ф",
+    "th": "т",
+    "wh": "в",
+    "ck": "к",
+    "oo": "у",
+    "ee": "і",
+    "ya": "я",
+    "ja": "я",
+    "yu": "ю",
+    "ju": "ю",
+    "ye": "є",
+    "je": "є",
+    "yi": "ий",
+    "ji": "ї",
+    "qu": "кв",
+    "ce": "се",
+    "ci": "сі",
+    "a": "а",
+    "b": "б",
+    "c": "к",
+    "d": "д",
+    "e": "е",
+    "f": "ф",
+    "g": "г",
+    "h": "г",
+    "i": "і",
+    "j": "дж",
+    "k": "к",
+    "l": "л",
+    "m": "м",
+    "n": "н",
+    "o": "о",
+    "p": "п",
+    "q": "к",
+    "r": "р",
+    "s": "с",
+    "t": "т",
+    "u": "у",
+    "v": "в",
+    "w": "в",
+    "x": "кс",
+    "y": "и",
+    "z": "з",
+}
+_LATIN_TO_CYRILLIC_RE = re.compile(
+    "|".join(sorted(_LATIN_TO_CYRILLIC, key=len, reverse=True)),
+    flags=re.IGNORECASE,
+)
+# "y" closing a word is pronounced as "і" (Happy -> Хеппі)
+_WORD_FINAL_Y_RE = re.compile(r"(?<=[а-яіїєґ])и\b", flags=re.IGNORECASE)
+
+
+@lru_cache(maxsize=TRANSLITERATION_CACHE_SIZE)
+def transliterate_english_to_ukrainian(text):
+    """Transliterate Latin text into Ukrainian Cyrillic by pronunciation."""
+    if not text:
+        return ""
+
+    def replace(match):
+        latin = match.group(0)
+        cyrillic = _LATIN_TO_CYRILLIC[latin.lower()]
+        # "yi" is "ї" at word start (Yizhak) and "ий" elsewhere (Dobryi)
+        start = match.start()
+        if latin.lower() == "yi" and (
+            start == 0 or not text[start - 1].isalpha()
+        ):
+            cyrillic = "ї"
+        return cyrillic if latin[0].islower() else cyrillic.capitalize()
+
+    cyrillic = _LATIN_TO_CYRILLIC_RE.sub(replace, text)
+    return _WORD_FINAL_Y_RE.sub(
+        lambda match: "і" if match.group(0).islower() else "І", cyrillic
+    )
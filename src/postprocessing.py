@@ -1,19 +1,16 @@
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-import json
 
-from .nlp.transliteration import transliterate_ukrainian_to_english
+from .merchant_history import get_frequency_priors, match_user_merchant
 
 from elastic.business_search import search_businesses
+from elastic.business_rerank import best_business_match, rerank_businesses
 from logging_config import logger
 
 
-def process_time_llm_response(
-    response, current_time=datetime.now().isoformat()
-):
-    """Process time response from LLM and convert it to datetime format."""
+def process_time_llm_response(data, current_time=datetime.now().isoformat()):
+    """Process parsed time response from LLM and convert it to datetime."""
     try:
-        data = json.loads(response)
         logger.debug(f"Data structure from LLM: {data}")
         logger.debug(f"Current time: {current_time}")
 
@@ -63,10 +60,15 @@ def process_time_llm_response(
         return {"datetime": str(ref_time)}
 
 
-def process_business_llm_response(response):
-    """Process business response from LLM and search for matching businesses."""
+def process_business_llm_response(
+    data, user_id=None, known_hits=None, deadline=None
+):
+    """Process parsed business response from LLM and search for matches.
+
+    known_hits holds search hits of values already searched ahead, and
+    deadline is the time.monotonic() by which the search must end.
+    """
     try:
-        data = json.loads(response)
         logger.debug(f"Extracted business by LLM: {data.get('business')}")
         logger.debug(f"LLM response: {data}")
 
@@ -74,24 +76,29 @@ def process_business_llm_response(response):
             logger.debug("No business entity extracted by LLM.")
             return {"business_id": None}
 
-        # Handle Ukrainian business input
-        if data.get("language") == "uk":
-            data["orig_uk_to_en_transliteration"] = (
-                transliterate_ukrainian_to_english(data["business"])
-            )
-            data["lemma_uk_to_en_transliteration"] = (
-                transliterate_ukrainian_to_english(data.get("uk_lemma", ""))
-            )
-
-        # Prepare values for search: remove 'language' and empty values
+        # Prepare values for search: remove 'language' and empty values.
+        # Transliterations and phonetic keys are precomputed in the index.
         filtered_data = {
             k: v for k, v in data.items() if k != "language" and v
         }
 
+        # Recurring merchants of the user resolve without a global search;
+        # requests without a user skip the history
+        history_match = user_id is not None and match_user_merchant(
+            user_id, list(filtered_data.values())
+        )
+        if history_match:
+            return {
+                "businesses": [history_match],
+                "businessId": history_match["id"],
+            }
+
         try:
             search_values = set(filtered_data.values())
             logger.debug(f"Searching businesses by values: {search_values}")
-            matched_businesses = search_businesses(search_values)
+            matched_businesses = search_businesses(
+                search_values, known_hits=known_hits, deadline=deadline
+            )
         except Exception as search_exc:
             logger.error(f"Error searching businesses: {search_exc}")
             matched_businesses = None
@@ -99,7 +106,18 @@ def process_business_llm_response(response):
         logger.debug(f"Matched businesses found: {matched_businesses}")
 
         if matched_businesses:
-            return {"businesses": matched_businesses}
+            priors = get_frequency_priors(user_id)
+            for match in matched_businesses:
+                match["prior"] = priors.get(match["id"], 0.0)
+            reranked = rerank_businesses(
+                list(filtered_data.values()), matched_businesses
+            )
+            best_match = best_business_match(reranked)
+            logger.debug(f"Best business match: {best_match}")
+            return {
+                "businesses": reranked,
+                "businessId": best_match["id"] if best_match else None,
+            }
 
         logger.info("No matched businesses found.")
         return {"business_id": None}
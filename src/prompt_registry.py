@@ -0,0 +1,117 @@
+import functools
+import os
+import random
+import zlib
+
+from dotenv import load_dotenv
+
+import metrics
+from logging_config import logger
+
+from .prompts import (
+    BUSINESS_PROMPT,
+    MAIN_PROMPT,
+    make_accounts_prompt,
+    make_categories_prompt,
+    make_datetime,
+    make_labels_prompt,
+)
+
+load_dotenv()
+
+# Versions of every extractor prompt and their share of traffic. A version
+# that served traffic is never edited; a new wording gets a new version.
+PROMPT_REGISTRY = {
+    "main": {
+        "v1": {"render": lambda: MAIN_PROMPT, "weight": 1.0},
+    },
+    "business": {
+        "v1": {"render": lambda: BUSINESS_PROMPT, "weight": 1.0},
+    },
+    "datetime": {
+        "v1": {"render": make_datetime, "weight": 1.0},
+    },
+    "categories": {
+        "v1": {"render": make_categories_prompt, "weight": 1.0},
+        "v2-compact": {
+            "render": functools.partial(make_categories_prompt, compact=True),
+            "weight": 0.0,
+        },
+    },
+    "labels": {
+        "v1": {"render": make_labels_prompt, "weight": 1.0},
+        "v2-compact": {
+            "render": functools.partial(make_labels_prompt, compact=True),
+            "weight": 0.0,
+        },
+    },
+    "accounts": {
+        "v1": {"render": make_accounts_prompt, "weight": 1.0},
+        "v2-compact": {
+            "render": functools.partial(make_accounts_prompt, compact=True),
+            "weight": 0.0,
+        },
+    },
+}
+
+
+def _parse_pinned_versions(value):
+    """Parse "extractor=version,..." into a dict of known versions."""
+    pinned = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        extractor, _, version = item.partition("=")
+        if version not in PROMPT_REGISTRY.get(extractor, {}):
+            logger.error(f"Unknown prompt version in PROMPT_VERSIONS: {item}")
+            continue
+        pinned[extractor] = version
+    return pinned
+
+
+# Versions served to every request regardless of the weights, e.g. to
+# evaluate a variant: PROMPT_VERSIONS="categories=v2-compact"
+PINNED_VERSIONS = _parse_pinned_versions(os.getenv("PROMPT_VERSIONS", ""))
+
+
+def choose_version(extractor, key=None):
+    """Pick the prompt version of an extractor by the traffic weights.
+
+    Requests with the same key, e.g. a user id, get the same version.
+    """
+    if extractor in PINNED_VERSIONS:
+        return PINNED_VERSIONS[extractor]
+    versions = PROMPT_REGISTRY[extractor]
+    rng = (
+        random.Random(zlib.crc32(f"{extractor}:{key}".encode("utf-8")))
+        if key is not None
+        else random
+    )
+    return rng.choices(
+        list(versions), weights=[v["weight"] for v in versions.values()]
+    )[0]
+
+
+def choose_versions(key=None):
+    """Pick the prompt version of every extractor."""
+    return {
+        extractor: choose_version(extractor, key)
+        for extractor in PROMPT_REGISTRY
+    }
+
+
+def render_prompt(extractor, version, *args):
+    """Render a prompt version with its inputs, e.g. the user data."""
+    return PROMPT_REGISTRY[extractor][version]["render"](*args)
+
+
+def record_variant(extractor, version, completion, latency):
+    """Record the tokens and latency of an answer to a prompt version."""
+    variant = f"prompt.{extractor}.{version}"
+    metrics.increment(f"{variant}.calls")
+    metrics.observe(
+        f"{variant}.tokens_in", completion["usage"].get("prompt_tokens", 0)
+    )
+    metrics.observe(
+        f"{variant}.tokens_out",
+        completion["usage"].get("completion_tokens", 0),
+    )
+    metrics.observe(f"{variant}.latency_ms", latency * 1000)
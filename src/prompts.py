@@ -106,8 +106,60 @@ JSON файл повинен мати наступний формат:
 """
 
 
-def make_categories_prompt(categories):
+def _compact_whitespace(prompt):
+    """Strip indentation and repeated blank lines of a prompt."""
+    lines = []
+    for line in prompt.strip().splitlines():
+        line = line.strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def encode_categories(categories):
+    """Encode child categories as id|name lines under their parent."""
+    return "\n".join(
+        f"{parent}:\n" + "\n".join(f"{id}|{name}" for id, name in children)
+        for parent, children in categories.items()
+    )
+
+
+def encode_labels(labels):
+    """Encode labels as id|name lines."""
+    return "\n".join(f"{label['id']}|{label['name']}" for label in labels)
+
+
+def encode_accounts(accounts):
+    """Encode accounts as id|name lines under their provider, named once."""
+    providers = {}
+    for account in accounts:
+        provider = account.get("provider") or {}
+        names = dict.fromkeys(
+            name for name in (provider.get("name"), provider.get("nameEn"))
+        )
+        key = " / ".join(name for name in names if name) or "-"
+        providers.setdefault(key, []).append(
+            f"{account['id']}|{account['name']}"
+        )
+    return "\n".join(
+        f"{provider}:\n" + "\n".join(lines)
+        for provider, lines in providers.items()
+    )
+
+
+def make_categories_prompt(categories, compact=False):
     """Create a prompt for transaction categorization."""
+    if compact:
+        categories = encode_categories(categories)
+        categories_format = (
+            'Категорії згруповані за батьківською: рядок "CategoryName:", '
+            "під ним дочірні категорії у форматі id|child_category."
+        )
+    else:
+        categories_format = (
+            'Категорії йдуть у форматі "CategoryName": '
+            "[(id, child_category), (id, child_category)]."
+        )
     prompt = f"""
     ###Ти експерт з класифікації покупок. Твоя роль - точно відповідати транзакції до найбільш релевантної категорії з доступного списку.###
     
@@ -116,8 +168,8 @@ def make_categories_prompt(categories):
     *categoryId - "id" найбільш релевантної категорії покупки з розділу ДОСТУПНІ КАТЕГОРІЇ відповідно до тексту = INT
 
     ###ОПИС###
-    Категорії йдуть у форматі "CategoryName": [(id, child_category), (id, child_category)]. Твоє завдання знайти (якщо така існує) найбільш релевантну дочірню категорію до вхідного тексту.
-    Будь впевненим в категорії. Якщо не підходить жодна (або текст не пов'язаний жодним чином з покупками) - поверни  {{"categoryId":None}}
+    {categories_format} Твоє завдання знайти (якщо така існує) найбільш релевантну дочірню категорію до вхідного тексту.
+    Будь впевненим в категорії. Якщо не підходить жодна (або текст не пов'язаний жодним чином з покупками) - поверни  {{"categoryId":null}}
 
     ###ДОСТУПНІ КАТЕГОРІЇ:###
     {categories}
@@ -129,11 +181,21 @@ def make_categories_prompt(categories):
     ###Розпарси текст в JSON файл згідно вимог. Повертай ВИКЛЮЧНО json файл у визначеному форматі і нічого більше (це важливо)!###
     """
 
-    return prompt
+    return _compact_whitespace(prompt) if compact else prompt
 
 
-def make_labels_prompt(labels):
+def make_labels_prompt(labels, compact=False):
     """Create a prompt for transaction labeling."""
+    if compact:
+        labels = encode_labels(labels)
+        labels_format = (
+            "Мітки (labels) йдуть по одній на рядок у форматі id|name"
+        )
+    else:
+        labels_format = (
+            "Мітки (labels) йдуть у форматі "
+            '[{"id":id,"name":"name"},{"id":id,"name":"name"}]'
+        )
     prompt = f"""
     ###Ти експерт з маркування транзакцій. Твоя роль - точно визначати всі релевантні мітки для транзакції з доступного списку.###
     
@@ -142,7 +204,7 @@ def make_labels_prompt(labels):
     *labelsId - список "id" найбільш релевантних категорій покупки з розділу ДОСТУПНІ МІТКИ відповідно до тексту = LIST of INT
 
     ###ОПИС###
-    Мітки (labels) йдуть у форматі [{{"id":id,"name":"name"}},{{"id":id,"name":"name"}}]
+    {labels_format}
 
     ###ДОСТУПНІ МІТКИ:###
     {labels}
@@ -158,10 +220,10 @@ def make_labels_prompt(labels):
     ###Розпарси текст в JSON файл згідно вимог. Повертай ВИКЛЮЧНО json файл у визначеному форматі і нічого більше (це важливо)!###
     """
 
-    return prompt
+    return _compact_whitespace(prompt) if compact else prompt
 
 
-def make_accounts_prompt(accounts):
+def make_accounts_prompt(accounts, compact=False):
     """Create a prompt for account identification."""
     data_example = [
         {
@@ -188,6 +250,18 @@ def make_accounts_prompt(accounts):
             },
         },
     ]
+    if compact:
+        data_example = encode_accounts(data_example)
+        accounts = encode_accounts(accounts)
+        accounts_format = (
+            "Рахунки згруповані за provider: рядок \"ім'я provider "
+            'українською / англійською:", під ним рахунки у форматі id|назва.'
+        )
+    else:
+        accounts_format = (
+            "Кожен рахунок (при наявності) містить 'id' рахунку, назву, "
+            "а також ім'я provider українською та англійською."
+        )
 
     prompt = f"""
     ###Ти експерт з ідентифікації банківських рахунків. Твоя роль - точно визначати який рахунок або картку використав користувач на основі тексту та розпізнавати скорочені назви банків.###
@@ -201,7 +275,7 @@ def make_accounts_prompt(accounts):
 
 
     ###Опис:###
-    Кожен рахунок (при наявності) містить 'id' рахунку, назву, а також ім'я provider українською та англійською.
+    {accounts_format}
     Важливі усі ці дані для прийняття рішення.
 
 
@@ -220,7 +294,7 @@ def make_accounts_prompt(accounts):
     - Вхідний текст: `"Купила з моно на 200 гривень продуктів"`
     - Відповідь: `{{"accountId": 52}}` (збіг за "моно" → "Monobank", без конкретної назви рахунку)
 
-    Якщо акаунт не знайдено - поверни {{"accountId":None}}
+    Якщо акаунт не знайдено - поверни {{"accountId":null}}
     ###Формат відповіді:###
     {{"accountId":int}}
 
@@ -231,7 +305,7 @@ def make_accounts_prompt(accounts):
     ###Розпарси текст в JSON файл згідно вимог. Повертай ВИКЛЮЧНО json файл у визначеному форматі і нічого більше (це важливо)!###
     """
 
-    return prompt
+    return _compact_whitespace(prompt) if compact else prompt
 
 
 def make_datetime(time=datetime.now().isoformat()):
@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+
+import metrics
+from logging_config import logger
+
+# USD per million input and output tokens
+MODEL_PRICES = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Models of every extractor from the cheapest up, and the mean output token
+# probability below which an answer is escalated to the next model
+EXTRACTOR_ROUTES = {
+    "main": {
+        "models": ("gpt-4.1-nano", "gpt-4o-mini", "gpt-4o"),
+        "min_confidence": 0.9,  # the description is free text
+    },
+    "categories": {
+        "models": ("gpt-4o-mini", "gpt-4o"),
+        "min_confidence": 0.95,
+    },
+    "labels": {
+        "models": ("gpt-4o-mini", "gpt-4o"),
+        "min_confidence": 0.95,
+    },
+    "accounts": {
+        "models": ("gpt-4.1-nano", "gpt-4o-mini", "gpt-4o"),
+        "min_confidence": 0.95,
+    },
+    "datetime": {
+        "models": ("gpt-4o-mini", "gpt-4o"),
+        "min_confidence": 0.95,
+    },
+    "business": {
+        "models": ("gpt-4o-mini", "gpt-4o"),
+        "min_confidence": 0.9,  # lemma and translation are free text
+    },
+}
+
+ROUTING_SETTINGS = {
+    "long_transcript": 400,  # characters; longer inputs skip the cheapest
+    "window": 50,  # latest answers per route used for the error rate
+    "min_calls": 10,  # answers in the window before the rate is trusted
+    "max_error_rate": 0.3,  # routes failing more often are skipped
+    "error_ttl": 600,  # seconds; skipped routes are tried again after it
+}
+
+_lock = threading.Lock()
+# (extractor, model) -> (time, failed) of the latest answers
+_outcomes = defaultdict(lambda: deque(maxlen=ROUTING_SETTINGS["window"]))
+
+
+def _error_rate(extractor, model, now):
+    """Return the recent error rate of a route, or None if unknown."""
+    with _lock:
+        outcomes = [
+            failed
+            for at, failed in _outcomes[extractor, model]
+            if now - at < ROUTING_SETTINGS["error_ttl"]
+        ]
+    if len(outcomes) < ROUTING_SETTINGS["min_calls"]:
+        return None
+    return sum(outcomes) / len(outcomes)
+
+
+def plan_route(extractor, text):
+    """Return the models to try for an input, cheapest first."""
+    models = EXTRACTOR_ROUTES[extractor]["models"]
+    start = 0
+    # Long inputs skip the cheapest model, but never go straight to the
+    # strongest one
+    if len(text) > ROUTING_SETTINGS["long_transcript"]:
+        start = min(1, len(models) - 2)
+    now = time.monotonic()
+    while start < len(models) - 1:
+        error_rate = _error_rate(extractor, models[start], now)
+        if (
+            error_rate is None
+            or error_rate <= ROUTING_SETTINGS["max_error_rate"]
+        ):
+            break
+        start += 1
+    return models[start:]
+
+
+def confidence(logprobs):
+    """Return the mean probability of the output tokens."""
+    if not logprobs:
+        return 1.0  # nothing to judge by, e.g. logprobs unsupported
+    return math.exp(sum(logprobs) / len(logprobs))
+
+
+def is_confident(extractor, completion):
+    """Check if an answer is confident enough to keep."""
+    return (
+        confidence(completion["logprobs"])
+        >= EXTRACTOR_ROUTES[extractor]["min_confidence"]
+    )
+
+
+def route_cost(model, usage):
+    """Return the cost of a completion in USD, or 0 for unknown models."""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (
+        usage.get("prompt_tokens", 0) * input_price
+        + usage.get("completion_tokens", 0) * output_price
+    ) / 1_000_000
+
+
+def record_route(extractor, completion, latency, failed):
+    """Record the outcome, cost and latency of one routed answer."""
+    model = completion["model"]
+    cost = route_cost(model, completion["usage"])
+    with _lock:
+        _outcomes[extractor, model].append((time.monotonic(), failed))
+
+    route = f"route.{extractor}.{model}"
+    metrics.increment(f"{route}.calls")
+    metrics.increment(f"{route}.cost_usd", cost)
+    metrics.observe(f"{route}.latency_ms", latency * 1000)
+    if failed:
+        metrics.increment(f"{route}.failed")
+    logger.info(
+        f"Route {extractor}/{model}: {latency * 1000:.0f} ms, "
+        f"{completion['usage'].get('prompt_tokens', 0)}+"
+        f"{completion['usage'].get('completion_tokens', 0)} tokens, "
+        f"${cost:.6f}, confidence "
+        f"{confidence(completion['logprobs']):.3f}"
+        f"{', failed' if failed else ''}"
+    )
@@ -0,0 +1,196 @@
+import orjson
+
+SCHEMA_SETTINGS = {
+    "max_retries": 1,  # re-asks of an extractor whose answer is invalid
+}
+
+_STRING = {"type": "string"}
+_NULLABLE_INT = {"type": ["integer", "null"]}
+
+
+def _object(properties):
+    """Build a strict object schema requiring every property."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+# Output schema of every extractor prompt, enforced by the chat model
+EXTRACTOR_SCHEMAS = {
+    "main": _object(
+        {
+            "currency": _STRING,
+            "amount": {"type": "number"},
+            "description": _STRING,
+        }
+    ),
+    "categories": _object({"categoryId": _NULLABLE_INT}),
+    "labels": _object(
+        {"labelsId": {"type": "array", "items": {"type": "integer"}}}
+    ),
+    "accounts": _object({"accountId": _NULLABLE_INT}),
+    "datetime": _object(
+        {
+            "time": {"type": ["string", "null"]},
+            "action": {"type": ["string", "null"], "enum": ["+", "-", None]},
+            "years": _NULLABLE_INT,
+            "months": _NULLABLE_INT,
+            "days": _NULLABLE_INT,
+            "hours": _NULLABLE_INT,
+            "minutes": _NULLABLE_INT,
+        }
+    ),
+    "business": _object(
+        {
+            "business": _STRING,
+            "language": _STRING,
+            "uk_lemma": _STRING,
+            "translation": _STRING,
+            "phonetic": _STRING,
+        }
+    ),
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class SchemaError(ValueError):
+    """Raised when a model response does not match its schema."""
+
+
+def response_format(name):
+    """Return the chat completion response_format of an extractor."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": EXTRACTOR_SCHEMAS[name],
+        },
+    }
+
+
+def _is_type(value, type_name):
+    """Check a value against a JSON Schema type name."""
+    # bool is an int subclass but not a JSON number
+    if isinstance(value, bool) and type_name in ("integer", "number"):
+        return False
+    return isinstance(value, _TYPES[type_name])
+
+
+def _check(value, schema, path):
+    """Raise SchemaError at the first part of value not matching schema."""
+    types = schema.get("type")
+    if types is not None:
+        types = [types] if isinstance(types, str) else types
+        if not any(_is_type(value, type_name) for type_name in types):
+            raise SchemaError(f"{path} must be {' or '.join(types)}")
+    if "enum" in schema and value not in schema["enum"]:
+        raise SchemaError(f"{path} must be one of {schema['enum']}")
+
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", ()):
+            if key not in value:
+                raise SchemaError(f"{path}.{key} is missing")
+        for key, item in value.items():
+            if key in properties:
+                _check(item, properties[key], f"{path}.{key}")
+            elif schema.get("additionalProperties") is False:
+                raise SchemaError(f"{path}.{key} is not allowed")
+    elif isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            _check(item, schema["items"], f"{path}[{index}]")
+
+
+def parse_json(text):
+    """Parse JSON text strictly, raising SchemaError if it is invalid."""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        raise SchemaError(f"invalid JSON: {e}") from None
+
+
+def parse_response(name, text):
+    """Parse and validate the response of an extractor."""
+    data = parse_json(text)
+    _check(data, EXTRACTOR_SCHEMAS[name], "$")
+    return data
+
+
+class IncrementalJSONParser:
+    """Parse a streamed JSON object, reporting each top-level key early.
+
+    on_key(key, value) is called as soon as a top-level value is complete,
+    while the rest of the object is still arriving. Values that are not
+    valid JSON are skipped; the full text is validated at the end.
+    """
+
+    def __init__(self, on_key):
+        self.on_key = on_key
+        self.text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._state = "key"  # key, colon or value at the top level
+        self._token_start = None
+        self._key = None
+
+    def _emit(self, end):
+        """Report the top-level value ending before end."""
+        try:
+            value = orjson.loads(self.text[self._token_start : end])
+        except orjson.JSONDecodeError:
+            return
+        self.on_key(self._key, value)
+
+    def feed(self, chunk):
+        """Consume the next piece of the streamed text."""
+        self.text += chunk
+        for index in range(self._position, len(self.text)):
+            char = self.text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        self._key = orjson.loads(
+                            self.text[self._token_start : index + 1]
+                        )
+                        self._state = "colon"
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._token_start = index
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 1 and self._state == "value":
+                    self._emit(index)
+                    self._state = "key"
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == ":" and self._state == "colon":
+                    self._state = "value"
+                    self._token_start = index + 1
+                elif char == "," and self._state == "value":
+                    self._emit(index)
+                    self._state = "key"
+        self._position = len(self.text)
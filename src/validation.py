@@ -1,7 +1,8 @@
-import json
 import logging
 from datetime import datetime
 
+from .schemas import SchemaError, parse_json
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,19 +15,15 @@ def validate_and_merge_json(response_jsons: tuple):
             if isinstance(response_json, dict):
                 output_json.update(response_json)
                 continue
-            # Otherwise sanitize and parse
+            # Otherwise parse strictly, values may contain quotes
             if isinstance(response_json, str):
-                sanitized = response_json.replace("None", "null").replace(
-                    "'", '"'
-                )
-                parsed_obj = json.loads(sanitized)
-                output_json.update(parsed_obj)
+                output_json.update(parse_json(response_json))
             else:
                 # For unsupported types, log and skip
                 logger.warning(
                     f"Unsupported response_json type: {type(response_json)}"
                 )
-        except json.JSONDecodeError as e:
+        except SchemaError as e:
             logger.error(f'Error: "{response_json}" is not valid JSON: {e}')
         except Exception as e:
             logger.error(f"Code error: {e}")
@@ -119,4 +116,14 @@ def validate_response(response_json, api_categories, api_labels, api_accounts):
         businesses if isinstance(businesses, list) else []
     )
 
+    # businessId (top reranked business)
+    business_id = response_json.get("businessId")
+    validated["businessId"] = (
+        business_id
+        if any(
+            item.get("id") == business_id for item in validated["businesses"]
+        )
+        else None
+    )
+
     return validated
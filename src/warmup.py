@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .merchant_history import get_popular_merchants
+
+from elastic.business_rerank import rerank_businesses
+from elastic.business_search import search_businesses
+from elastic.es_client import es, INDEX_NAME
+from logging_config import logger
+
+WARMUP_SETTINGS = {
+    "queries": 50,  # popular merchants searched at start
+    "concurrency": 8,  # parallel searches, opens as many pooled connections
+    "health_timeout": 10,  # seconds to wait for at least a yellow cluster
+    "retry_interval": 5,  # seconds between failed warm-up attempts
+}
+
+_lock = threading.Lock()
+_thread = None
+_status = {"ready": False, "checks": {}, "warmedQueries": 0, "error": None}
+
+
+def _warmup_queries(limit):
+    """Return popular merchant names, or catalogue names as a fallback."""
+    names = get_popular_merchants(limit)
+    if len(names) < limit:
+        response = es.search(
+            index=INDEX_NAME,
+            size=limit - len(names),
+            query={"match_all": {}},
+            source=["name"],
+        )
+        names += [hit["_source"]["name"] for hit in response["hits"]["hits"]]
+    return names
+
+
+def _warm_search(name):
+    """Run one search end to end, priming ES and in-process caches.
+
+    Returns whether it succeeded; one failing query does not stop the
+    warm-up.
+    """
+    try:
+        rerank_businesses([name], search_businesses({name}, warmup=True))
+    except Exception as e:
+        logger.warning(f"Warm-up search for '{name}' failed: {e}")
+        return False
+    return True
+
+
+def run_warmup(settings=WARMUP_SETTINGS):
+    """Check dependencies and warm the business search path once."""
+    checks = {}
+    warmed_queries = 0
+    started = time.perf_counter()
+
+    # The client waits longer than the cluster-side wait it asked for
+    health = es.options(
+        request_timeout=settings["health_timeout"] + 5
+    ).cluster.health(
+        wait_for_status="yellow", timeout=f"{settings['health_timeout']}s"
+    )
+    checks["elasticsearch"] = not health["timed_out"]
+    checks["alias"] = bool(es.indices.exists_alias(name=INDEX_NAME))
+    if all(checks.values()):
+        names = _warmup_queries(settings["queries"])
+        with ThreadPoolExecutor(settings["concurrency"]) as executor:
+            warmed_queries = sum(executor.map(_warm_search, names))
+
+    with _lock:
+        _status["checks"] = checks
+        _status["warmedQueries"] = warmed_queries
+        _status["ready"] = all(checks.values())
+    logger.info(
+        f"Warm-up finished in {time.perf_counter() - started:.1f}s, "
+        f"{warmed_queries} queries: {checks}"
+    )
+    return _status["ready"]
+
+
+def _warmup_until_ready(settings):
+    """Retry the warm-up until every dependency check passes."""
+    while True:
+        try:
+            if run_warmup(settings):
+                with _lock:
+                    _status["error"] = None
+                return
+        except Exception as e:
+            logger.error(f"Warm-up failed: {e}")
+            with _lock:
+                _status["error"] = str(e)
+        time.sleep(settings["retry_interval"])
+
+
+def start_warmup(settings=WARMUP_SETTINGS):
+    """Start the warm-up in a background thread once per worker."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(
+            target=_warmup_until_ready,
+            args=(settings,),
+            name="warmup",
+            daemon=True,
+        )
+        _thread.start()
+
+
+def readiness():
+    """Return whether the worker is warmed up, with the check results."""
+    with _lock:
+        return {**_status, "checks": dict(_status["checks"])}